@@ -0,0 +1,102 @@
+"""Lookup tables for where pieces can go from each square, built once at import
+time so nothing has to work out coordinates or bounds check during a game.
+
+Squares are indexed row * 8 + col and entries are (row, col) tuples ordered
+outwards from the square, the same order the ray helpers on Chesspiece use.
+Pawn tables are laid out for white moving towards row 0."""
+
+def onBoard(row: int, col: int) -> bool:
+    return 0 <= row < 8 and 0 <= col < 8
+
+DIRECTIONS = {
+    'downRight': (1, 1),  'downLeft': (1, -1),
+    'upRight': (-1, 1),   'upLeft': (-1, -1),
+    'left': (0, -1),      'right': (0, 1),
+    'up': (-1, 0),        'down': (1, 0),
+}
+STRAIGHT = ('left', 'right', 'up', 'down')
+DIAGONAL = ('downRight', 'downLeft', 'upRight', 'upLeft')
+
+KNIGHT_JUMPS = [
+            (2, 1), (2, -1),
+    (1, -2),                (1, 2),
+    (-1, -2),               (-1, 2),
+            (-2, 1), (-2, -1)
+]
+KING_STEPS = [
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1),           (0, 1),
+    (1, -1),  (1, 0),  (1, 1)
+]
+
+def buildSteps(steps: list) -> list:
+    return [
+        tuple(
+            (row + dRow, col + dCol) for dRow, dCol in steps
+            if onBoard(row + dRow, col + dCol)
+        )
+        for row in range(8) for col in range(8)
+    ]
+
+def buildRays() -> list:
+    rays = []
+    for row in range(8):
+        for col in range(8):
+            squareRays = {}
+            for direction, (dRow, dCol) in DIRECTIONS.items():
+                squareRays[direction] = tuple(
+                    (row + dRow * i, col + dCol * i) for i in range(1, 8)
+                    if onBoard(row + dRow * i, col + dCol * i)
+                )
+            rays.append(squareRays)
+    return rays
+
+def buildPawnTables(forward: int, startRow: int) -> tuple:
+    pushes, captures = [], []
+    for row in range(8):
+        for col in range(8):
+            push = [(row + forward, col)]
+            if row == startRow:
+                push.append((row + 2 * forward, col))
+            pushes.append(tuple(sq for sq in push if onBoard(*sq)))
+            captures.append(tuple(
+                (row + forward, col + side) for side in (-1, 1)
+                if onBoard(row + forward, col + side)
+            ))
+    return pushes, captures
+
+def toMask(squares) -> int:
+    mask = 0
+    for row, col in squares:
+        mask |= 1 << (row * 8 + col)
+    return mask
+
+KNIGHT_MOVES = buildSteps(KNIGHT_JUMPS)
+KING_MOVES = buildSteps(KING_STEPS)
+RAYS = buildRays()
+
+PAWN_PUSHES, PAWN_CAPTURES = {}, {}
+PAWN_PUSHES['white'], PAWN_CAPTURES['white'] = buildPawnTables(-1, 6)
+PAWN_PUSHES['black'], PAWN_CAPTURES['black'] = buildPawnTables(1, 1)
+
+def toSquares(table: list) -> list:
+    """The same table with squares as row * 8 + col instead of (row, col)"""
+    return [tuple(row * 8 + col for row, col in squares) for squares in table]
+
+KNIGHT_TARGETS = toSquares(KNIGHT_MOVES)
+KING_TARGETS = toSquares(KING_MOVES)
+RAY_TARGETS = [
+    {direction: toSquares([ray])[0] for direction, ray in rays.items()} for rays in RAYS
+]
+# square -> {square on one of its rays: direction of that ray}
+RAY_DIRECTIONS = [
+    {target: direction for direction, ray in rays.items() for target in ray} for rays in RAY_TARGETS
+]
+PAWN_CAPTURE_TARGETS = {color: toSquares(table) for color, table in PAWN_CAPTURES.items()}
+
+KNIGHT_MASKS = [toMask(squares) for squares in KNIGHT_MOVES]
+KING_MASKS = [toMask(squares) for squares in KING_MOVES]
+PAWN_CAPTURE_MASKS = {
+    color: [toMask(squares) for squares in table]
+    for color, table in PAWN_CAPTURES.items()
+}
@@ -0,0 +1,247 @@
+"""Repeatable timings over a fixed set of positions and games, saved as a JSON
+baseline and checked against it so a change that makes something slower
+gets caught.
+
+Every benchmark does the same work each time, over the perft test positions
+and the games in GAMES (nothing random), a few times over and keeps the
+fastest run, the least noisy number on a busy machine. Results are seconds
+per operation, lower is better. A check fails any benchmark more than its
+threshold slower than the baseline, THRESHOLD unless the baseline file's
+thresholds say something else for it. Timings only compare on the same
+machine, the baseline notes which one it came from.
+
+ex. python benchmark.py run --save baseline.json
+    python benchmark.py run --compare baseline.json
+    python benchmark.py run --only replay perft --repeat 10"""
+import argparse
+import gc
+import json
+import platform
+import time
+from chessBoard import Chessboard, Pawn, Knight, Bishop, Rook, Queen, King
+from bitBoard import Bitboard
+from chessGame import Chessgame
+from boardIO import boardFromFen, boardToFen
+from engine import Engine, BENCH_POSITIONS
+from evaluate import evaluate
+from moveGen import moveFromUci
+from notation import NAMES
+from perft import POSITIONS, perft
+from pgn import PgnGame, replayGame
+from server import BENCH_GAME
+
+THRESHOLD = 0.25 # fraction slower than the baseline that fails
+REPEAT = 5
+PERFT_DEPTH = 3
+SEARCH_DEPTH = 3
+GAMES = {
+    # Morphy - Duke Karl / Count Isouard, Paris 1858
+    'opera': 'e4 e5 Nf3 d6 d4 Bg4 dxe5 Bxf3 Qxf3 dxe5 Bc4 Nf6 Qb3 Qe7 Nc3 c6 Bg5 b5 Nxb5 '
+             'cxb5 Bxb5+ Nbd7 O-O-O Rd8 Rxd7 Rxd7 Rd1 Qe6 Bxd7+ Nxd7 Qb8+ Nxb8 Rd8#',
+    # Anderssen - Kieseritzky, London 1851
+    'immortal': 'e4 e5 f4 exf4 Bc4 Qh4+ Kf1 b5 Bxb5 Nf6 Nf3 Qh6 d3 Nh5 Nh4 Qg5 Nf5 c6 g4 Nf6 '
+                'Rg1 cxb5 h4 Qg6 h5 Qg5 Qf3 Ng8 Bxf4 Qf6 Nc3 Bc5 Nd5 Qxb2 Bd6 Bxg1 e5 Qxa1+ '
+                'Ke2 Na6 Nxg7+ Kd8 Qf6+ Nxf6 Be7#',
+    # Anderssen - Dufresne, Berlin 1852
+    'evergreen': 'e4 e5 Nf3 Nc6 Bc4 Bc5 b4 Bxb4 c3 Ba5 d4 exd4 O-O d3 Qb3 Qf6 e5 Qg6 Re1 Nge7 '
+                 'Ba3 b5 Qxb5 Rb8 Qa4 Bb6 Nbd2 Bb7 Ne4 Qf5 Bxd3 Qh5 Nf6+ gxf6 exf6 Rg8 Rad1 '
+                 'Qxf3 Rxe7+ Nxe7 Qxd7+ Kxd7 Bf5+ Ke8 Bd7+ Kf8 Bxe7#',
+    # D. Byrne - Fischer, New York 1956
+    'century': 'Nf3 Nf6 c4 g6 Nc3 Bg7 d4 O-O Bf4 d5 Qb3 dxc4 Qxc4 c6 e4 Nbd7 Rd1 Nb6 Qc5 Bg4 '
+               'Bg5 Na4 Qa3 Nxc3 bxc3 Nxe4 Bxe7 Qb6 Bc4 Nxc3 Bc5 Rfe8+ Kf1 Be6 Bxb6 Bxc4+ '
+               'Kg1 Ne2+ Kf1 Nxd4+ Kg1 Ne2+ Kf1 Nc3+ Kg1 axb6 Qb4 Ra4 Qxb6 Nxd1 h3 Rxa2 Kh2 '
+               'Nxf2 Re1 Rxe1 Qd8+ Bf8 Nxe1 Bd5 Nf3 Ne4 Qb8 b5 h4 h5 Ne5 Kg7 Kg1 Bc5+ Kf1 '
+               'Ng3+ Ke1 Bb4+ Kd1 Bb3+ Kc1 Ne2+ Kb1 Nc3+ Kc1 Rc2#',
+    'ruyLopez': ' '.join(BENCH_GAME),
+}
+
+def gamePlies() -> list:
+    """(fen before the move, san) for every move of every game in GAMES"""
+    plies = []
+    for text in GAMES.values():
+        game = Chessgame(Chessboard())
+        for san in text.split():
+            plies.append((boardToFen(game.boardObj), san))
+            game.playMove(san)
+    return plies
+
+def corpusFens() -> list:
+    """The perft positions and every position the games in GAMES go through"""
+    return list(POSITIONS.values()) + [fen for fen, san in gamePlies()]
+
+# each takes no arguments and returns (run, operations), setup isn't timed
+def benchConstruct():
+    def run():
+        for i in range(50):
+            Chessboard()
+    return run, 50
+
+def benchCanMoveTo(kind):
+    def setup():
+        pieces = []
+        for fen in corpusFens():
+            chessboard = boardFromFen(fen)
+            pieces += [(piece, chessboard) for piece in chessboard.searchBoard(kind)]
+
+        def run():
+            for piece, chessboard in pieces:
+                for name in NAMES:
+                    piece.canMoveTo(name, chessboard)
+        return run, len(pieces) * len(NAMES)
+    return setup
+
+def benchInCheck():
+    games = [Chessgame(boardFromFen(fen)) for fen in corpusFens()]
+
+    def run():
+        for game in games:
+            game.inCheck()
+    return run, len(games)
+
+def benchGetPieceToMove():
+    plies = [(Chessgame(boardFromFen(fen)), san) for fen, san in gamePlies()]
+
+    def run():
+        for game, san in plies:
+            if game.getPieceToMove(san, game.turn) is None:
+                raise RuntimeError(f'{san} found no piece')
+    return run, len(plies)
+
+def benchReplay(boardType):
+    def setup():
+        games = [PgnGame(number, {}, text.split(), '*') for number, text in enumerate(GAMES.values(), 1)]
+
+        def run():
+            for game in games:
+                replayGame(game, boardType)
+        return run, sum(len(game.moves) for game in games)
+    return setup
+
+def benchPerft(boardType):
+    def setup():
+        nodes = perft(boardType(), PERFT_DEPTH)
+
+        def run():
+            perft(boardType(), PERFT_DEPTH)
+        return run, nodes
+    return setup
+
+def benchSearch():
+    """engine.py's bench positions, with a fresh engine every time so nothing
+    carries over between runs"""
+    fens = []
+    for moves in BENCH_POSITIONS:
+        chessboard = Chessboard()
+        for uci in moves:
+            chessboard.makeMove(moveFromUci(chessboard, uci))
+        fens.append(boardToFen(chessboard))
+
+    def run():
+        for fen in fens:
+            Engine(moveTime=3600).search(boardFromFen(fen), maxDepth=SEARCH_DEPTH)
+    return run, len(fens)
+
+def benchEvaluate():
+    boards = [boardFromFen(fen) for fen in corpusFens()]
+
+    def run():
+        for chessboard in boards:
+            evaluate(chessboard)
+    return run, len(boards)
+
+BENCHMARKS = {
+    'construct': benchConstruct,
+    **{f'canMoveTo.{kind.__name__}': benchCanMoveTo(kind) for kind in (Pawn, Knight, Bishop, Rook, Queen, King)},
+    'inCheck': benchInCheck,
+    'getPieceToMove': benchGetPieceToMove,
+    'replay': benchReplay(Chessboard),
+    'replay.Bitboard': benchReplay(Bitboard),
+    'perft': benchPerft(Chessboard),
+    'perft.Bitboard': benchPerft(Bitboard),
+    'search': benchSearch,
+    'evaluate': benchEvaluate,
+}
+
+def timeBenchmark(setup, repeat: int = REPEAT) -> float:
+    """Fastest of repeat runs, in seconds per operation. The garbage
+    collector is off while timing like timeit does, when it happens to run
+    is most of the noise otherwise"""
+    run, operations = setup()
+    best = float('inf')
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best / operations
+
+def runAll(names=None, repeat: int = REPEAT) -> dict:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        results[name] = timeBenchmark(setup, repeat)
+        print(f'{name:20} {results[name] * 1e6:12.2f} us/op')
+    return results
+
+def compare(results: dict, baseline: dict) -> list:
+    """(name, baseline, now, ratio, failed) for every benchmark in both"""
+    thresholds = baseline.get('thresholds', {})
+    rows = []
+    for name, now in results.items():
+        before = baseline['metrics'].get(name)
+        if before is None:
+            continue
+        ratio = now / before
+        rows.append((name, before, now, ratio, ratio > 1 + thresholds.get(name, THRESHOLD)))
+    return rows
+
+def save(path: str, results: dict, thresholds: dict = None):
+    with open(path, 'w') as file:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'metrics': results,       # seconds per operation
+            'thresholds': thresholds or {},
+        }, file, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks with saved baselines')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmarks')
+    run.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='just these')
+    run.add_argument('--repeat', type=int, default=REPEAT, help='runs of each, the fastest counts')
+    run.add_argument('--save', help='write the results as a baseline')
+    run.add_argument('--compare', help='baseline to check against, exits 1 if anything regressed')
+    commands.add_parser('list', help='names of the benchmarks')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print('\n'.join(BENCHMARKS))
+        return 0
+    results = runAll(args.only, args.repeat)
+    status = 0
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        for name, before, now, ratio, failed in compare(results, baseline):
+            print(f'{name:20} {before * 1e6:12.2f} -> {now * 1e6:10.2f} us/op '
+                  f'{(ratio - 1) * 100:+6.1f}%{"  REGRESSED" if failed else ""}')
+            if failed:
+                status = 1
+    if args.save:
+        thresholds = {}
+        try: # keep thresholds someone set in the file being replaced
+            with open(args.save) as file:
+                thresholds = json.load(file).get('thresholds', {})
+        except (OSError, ValueError):
+            pass
+        save(args.save, results, thresholds)
+    return status
+
+if __name__ == "__main__":
+    raise SystemExit(main())
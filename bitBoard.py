@@ -0,0 +1,435 @@
+"""Bitboard, a Chessboard backend that keeps a 64 bit mask per piece kind and
+color and does its move generation and attack lookups with shifts and ands
+on them instead of walking the rows.
+
+board and pieceIndex are still kept so pieces, notation and Chessgame work
+the same, but none of the per square attack counts are: attacks is worked
+out from the masks when something reads it (evaluate does) and cached until
+the next change. Square index is row * 8 + col, so bit 0 is the top left of
+the printed board.
+
+ex. Chessgame(Bitboard())
+    boardFromFen(fen, Bitboard)"""
+from chessBoard import (
+    Chessboard, Chesspiece, Move, EMPTY, Pawn, King, Queen, Bishop, Knight, Rook,
+    QUIET, DOUBLE_PUSH, EN_PASSANT, CASTLE, CASTLING, EN_PASSANT_ROWS
+)
+from attackTables import KNIGHT_MASKS, KING_MASKS, PAWN_CAPTURE_MASKS, RAY_TARGETS, STRAIGHT, DIAGONAL
+from pieceSquare import PIECE_SQUARE
+from zobrist import PIECE_KEYS
+
+FULL = (1 << 64) - 1
+FIRST_COL = sum(1 << (row * 8) for row in range(8))
+NOT_FIRST_COL = FULL ^ FIRST_COL
+NOT_LAST_COL = FULL ^ (FIRST_COL << 7)
+
+# rays are numbered, straight ones first, so a square's rays are a tuple
+RAY_NAMES = STRAIGHT + DIAGONAL
+STRAIGHT_RAYS, DIAGONAL_RAYS = (0, 1, 2, 3), (4, 5, 6, 7)
+# square -> mask of every square on each ray
+RAY_MASKS = [
+    tuple(sum(1 << target for target in rays[name]) for name in RAY_NAMES)
+    for rays in RAY_TARGETS
+]
+# rays whose squares go up in index, their nearest piece is the lowest bit
+ASCENDING = tuple(name in ('right', 'down', 'downLeft', 'downRight') for name in RAY_NAMES)
+
+def buildBetween() -> list:
+    """square -> {square on one of its rays: mask of the squares in between}"""
+    between = [{} for square in range(64)]
+    for square, rays in enumerate(RAY_TARGETS):
+        for ray in rays.values():
+            passed = 0
+            for target in ray:
+                between[square][target] = passed
+                passed |= 1 << target
+    return between
+
+BETWEEN = buildBetween()
+PROMOTIONS = (Queen, Rook, Bishop, Knight) # same order as moveGen's
+LAST_ROWS = {'white': 0xFF, 'black': 0xFF << 56}
+START_ROWS = {'white': 0xFF << 48, 'black': 0xFF << 8}
+PUSHED_ROWS = {'white': 0xFF << 40, 'black': 0xFF << 16} # where a pawn lands one step off its start
+
+def toSquare(name: str) -> int:
+    return (8 - int(name[1])) * 8 + ord(name[0]) - 97
+
+# castling right -> (king from, king to, squares that have to be empty, squares that can't be attacked)
+# castling right -> (color, king's home square, rook's home square)
+CASTLE_HOMES = {
+    right: ('white' if right.isupper() else 'black', toSquare(kingFrom), toSquare(rookFrom))
+    for right, (kingFrom, kingTo, rookFrom, rookTo, between) in CASTLING.items()
+}
+CASTLE_MASKS = {
+    right: (toSquare(kingFrom), toSquare(kingTo),
+            sum(1 << toSquare(name) for name in between),
+            sum(1 << toSquare(name) for name in (kingFrom, rookTo, kingTo)))
+    for right, (kingFrom, kingTo, rookFrom, rookTo, between) in CASTLING.items()
+}
+
+# Move without going through its __new__, about twice as fast and legalMoves
+# makes one for every move it finds
+newMove = tuple.__new__
+
+def nearest(ray: int, blockers: int) -> int:
+    """Square of the first piece along ray out of blockers"""
+    if ASCENDING[ray]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+def slide(square: int, rays: tuple, occupied: int) -> int:
+    """Squares a slider on square attacks along rays, up to and including the
+    first piece hit"""
+    masks = RAY_MASKS[square]
+    attacks = 0
+    for ray in rays:
+        reach = masks[ray]
+        blockers = reach & occupied
+        if blockers:
+            # nearest() written out, this runs for every slider on every move
+            if ASCENDING[ray]:
+                blockers &= -blockers
+            reach ^= RAY_MASKS[blockers.bit_length() - 1][ray] # everything behind it
+        attacks |= reach
+    return attacks
+
+def squares(mask: int):
+    """Yields the square index of every set bit"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class Bitboard(Chessboard):
+    """Drop in Chessboard that moves, generates moves and answers attack
+    queries off its masks"""
+    generatesMoves = True
+
+    def setPosition(self, rows: list, turn='white', castling='KQkq', enPassant=None):
+        super().setPosition(rows, turn, castling, enPassant)
+        self.rebuildMasks()
+
+    def rebuildMasks(self):
+        """Builds all the masks from scratch off of board"""
+        self.masks = {
+            (kind, color): 0
+            for kind in (Pawn, Knight, Bishop, Rook, Queen, King)
+            for color in ('white', 'black')
+        }
+        self.occupied = {'white': 0, 'black': 0}
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece is not EMPTY:
+                    self.masks[(type(piece), piece.color)] |= 1 << (row * 8 + col)
+                    self.occupied[piece.color] |= 1 << (row * 8 + col)
+
+    def rebuildAttacks(self):
+        self.counts = None # attacks, worked out again when it's next read
+
+    @property
+    def attacks(self) -> dict:
+        """color -> how many of its pieces attack each square, the same as
+        Chessboard keeps"""
+        if self.counts is None:
+            occupied = self.occupied['white'] | self.occupied['black']
+            self.counts = {}
+            for color in ('white', 'black'):
+                counts = [0] * 64
+                for (kind, pieceColor), mask in self.masks.items():
+                    if pieceColor != color:
+                        continue
+                    for square in squares(mask):
+                        for target in squares(self.pieceAttacks(kind, color, square, occupied)):
+                            counts[target] += 1
+                self.counts[color] = counts
+        return self.counts
+
+    # setPiece and clearSquare do everything Chessboard's do except the attack
+    # counts, written out since they run a few times on every move
+    def setPiece(self, piece: Chesspiece, row: int, col: int):
+        square = row * 8 + col
+        b = 1 << square
+        captured = self.board[row][col]
+        if captured is not EMPTY:
+            self.unindex(captured)
+            key = (captured.letter, captured.color)
+            self.hash ^= PIECE_KEYS[key][square]
+            self.pieceScore -= PIECE_SQUARE[key][square]
+            self.masks[(type(captured), captured.color)] ^= b
+            self.occupied[captured.color] ^= b
+        if piece is not EMPTY:
+            self.unindex(piece) # in case it wasn't cleared first
+            piece.pos = (row, col)
+            self.pieceIndex[(type(piece), piece.color)][piece.pos] = piece
+            key = (piece.letter, piece.color)
+            self.hash ^= PIECE_KEYS[key][square]
+            self.pieceScore += PIECE_SQUARE[key][square]
+            self.masks[(type(piece), piece.color)] ^= b
+            self.occupied[piece.color] ^= b
+        self.board[row][col] = piece
+        self.counts = None
+
+    def clearSquare(self, row: int, col: int):
+        piece = self.board[row][col]
+        if piece is not EMPTY:
+            square = row * 8 + col
+            b = 1 << square
+            self.unindex(piece)
+            key = (piece.letter, piece.color)
+            self.hash ^= PIECE_KEYS[key][square]
+            self.pieceScore -= PIECE_SQUARE[key][square]
+            self.masks[(type(piece), piece.color)] ^= b
+            self.occupied[piece.color] ^= b
+            self.board[row][col] = EMPTY
+            self.counts = None
+
+    def updateCastling(self):
+        """Same as Chessboard.updateCastling with the home squares looked up"""
+        board = self.board
+        rights = ''
+        for right in self.castling:
+            color, kingAt, rookAt = CASTLE_HOMES[right]
+            king = board[kingAt >> 3][kingAt & 7]
+            rook = board[rookAt >> 3][rookAt & 7]
+            if (type(king) is King and king.color == color and not king.hasMoved and
+                    type(rook) is Rook and rook.color == color and not rook.hasMoved):
+                rights += right
+        if rights != self.castling:
+            self.castling = rights
+
+    def pieceAttacks(self, kind, color: str, square: int, occupied: int) -> int:
+        """Squares a kind of color's piece on square attacks"""
+        if kind is Pawn:
+            return PAWN_CAPTURE_MASKS[color][square]
+        if kind is Knight:
+            return KNIGHT_MASKS[square]
+        if kind is King:
+            return KING_MASKS[square]
+        if kind is Rook:
+            return slide(square, STRAIGHT_RAYS, occupied)
+        if kind is Bishop:
+            return slide(square, DIAGONAL_RAYS, occupied)
+        return slide(square, STRAIGHT_RAYS + DIAGONAL_RAYS, occupied)
+
+    def attackerMask(self, square: int, color: str, occupied: int) -> int:
+        """color's pieces attacking square as a mask, with occupied as the
+        pieces that block"""
+        masks = self.masks
+        other = 'black' if color == 'white' else 'white'
+        found = (KNIGHT_MASKS[square] & masks[(Knight, color)] |
+                 KING_MASKS[square] & masks[(King, color)] |
+                 PAWN_CAPTURE_MASKS[other][square] & masks[(Pawn, color)])
+        queens = masks[(Queen, color)]
+        straight = queens | masks[(Rook, color)]
+        if straight:
+            found |= slide(square, STRAIGHT_RAYS, occupied) & straight
+        diagonal = queens | masks[(Bishop, color)]
+        if diagonal:
+            found |= slide(square, DIAGONAL_RAYS, occupied) & diagonal
+        return found
+
+    def isAttacked(self, row: int, col: int, byColor: str) -> bool:
+        occupied = self.occupied['white'] | self.occupied['black']
+        return self.attackerMask(row * 8 + col, byColor, occupied) != 0
+
+    def kingInCheck(self, color: str) -> bool:
+        kingSquare = self.masks[(King, color)].bit_length() - 1
+        occupied = self.occupied['white'] | self.occupied['black']
+        return self.attackerMask(kingSquare, 'black' if color == 'white' else 'white', occupied) != 0
+
+    def pinLines(self, color: str, kingSquare: int, occupied: int) -> dict:
+        """square of each of color's pinned pieces -> the ray from its king it
+        has to stay on"""
+        enemy = 'black' if color == 'white' else 'white'
+        masks = self.masks
+        own = self.occupied[color]
+        rays = RAY_MASKS[kingSquare]
+        queens = masks[(Queen, enemy)]
+        pins = {}
+        for directions, sliders in ((STRAIGHT_RAYS, queens | masks[(Rook, enemy)]),
+                                    (DIAGONAL_RAYS, queens | masks[(Bishop, enemy)])):
+            if not sliders:
+                continue
+            for ray in directions:
+                reach = rays[ray]
+                if not reach & sliders:
+                    continue
+                blocker = nearest(ray, reach & occupied)
+                if not own >> blocker & 1:
+                    continue
+                behind = RAY_MASKS[blocker][ray] & occupied
+                if behind and sliders >> nearest(ray, behind) & 1:
+                    pins[blocker] = reach
+        return pins
+
+    def pinnedSquares(self, color: str) -> set:
+        kingSquare = self.masks[(King, color)].bit_length() - 1
+        occupied = self.occupied['white'] | self.occupied['black']
+        return set(self.pinLines(color, kingSquare, occupied))
+
+    def legalMoves(self, color: str) -> list:
+        """Every legal move for color. Checks and pins are worked out once up
+        front and cut down each piece's targets, only en passant is tried on
+        the board"""
+        enemy = 'black' if color == 'white' else 'white'
+        masks = self.masks
+        own = self.occupied[color]
+        theirs = self.occupied[enemy]
+        occupied = own | theirs
+        kingSquare = masks[(King, color)].bit_length() - 1
+        moves = []
+        append = moves.append
+
+        # with the king taken off, squares behind it on a checking ray show up as attacked
+        withoutKing = occupied ^ (1 << kingSquare)
+        for target in squares(KING_MASKS[kingSquare] & ~own):
+            if not self.attackerMask(target, enemy, withoutKing):
+                append(newMove(Move, (kingSquare, target, None, QUIET)))
+        checkers = self.attackerMask(kingSquare, enemy, occupied)
+        if checkers & (checkers - 1): # double check, only the king can move
+            return moves
+        if checkers:
+            allowed = checkers | BETWEEN[kingSquare].get(checkers.bit_length() - 1, 0)
+        else:
+            allowed = FULL & ~own
+            for right in self.castling:
+                if right.isupper() == (color == 'white'):
+                    kingFrom, kingTo, empty, crossed = CASTLE_MASKS[right]
+                    if not occupied & empty and not any(
+                            self.attackerMask(square, enemy, occupied) for square in squares(crossed)):
+                        append(Move(kingFrom, kingTo, None, CASTLE))
+        pins = self.pinLines(color, kingSquare, occupied)
+
+        for square in squares(masks[(Knight, color)]):
+            if square not in pins: # a pinned knight can never stay on the line
+                targets = KNIGHT_MASKS[square] & allowed
+                while targets:
+                    low = targets & -targets
+                    append(newMove(Move, (square, low.bit_length() - 1, None, QUIET)))
+                    targets ^= low
+        queens = masks[(Queen, color)]
+        for kind, rays in ((Rook, STRAIGHT_RAYS), (Bishop, DIAGONAL_RAYS)):
+            for square in squares(masks[(kind, color)] | queens):
+                targets = slide(square, rays, occupied) & allowed
+                if square in pins:
+                    targets &= pins[square]
+                while targets:
+                    low = targets & -targets
+                    append(newMove(Move, (square, low.bit_length() - 1, None, QUIET)))
+                    targets ^= low
+
+        # unpinned pawns all at once with shifts, forward is the step a push takes
+        pawns = masks[(Pawn, color)]
+        pinned = sum(1 << square for square in pins)
+        free = pawns & ~pinned
+        if color == 'white':
+            forward = -8
+            single = (free >> 8) & ~occupied
+            double = ((single & PUSHED_ROWS[color]) >> 8) & ~occupied
+            left = (free >> 9) & NOT_LAST_COL & theirs
+            right = (free >> 7) & NOT_FIRST_COL & theirs
+        else:
+            forward = 8
+            single = (free << 8) & ~occupied
+            double = ((single & PUSHED_ROWS[color]) << 8) & ~occupied
+            left = (free << 7) & NOT_LAST_COL & theirs
+            right = (free << 9) & NOT_FIRST_COL & theirs
+        lastRow = LAST_ROWS[color]
+        for targets, step in ((single, forward), (left, forward - 1), (right, forward + 1)):
+            targets &= allowed
+            while targets:
+                low = targets & -targets
+                target = low.bit_length() - 1
+                targets ^= low
+                if low & lastRow:
+                    for promotion in PROMOTIONS:
+                        append(Move(target - step, target, promotion))
+                else:
+                    append(newMove(Move, (target - step, target, None, QUIET)))
+        for target in squares(double & allowed):
+            append(Move(target - 2 * forward, target, None, DOUBLE_PUSH))
+
+        captures = PAWN_CAPTURE_MASKS[color]
+        for square in squares(pawns & pinned):
+            one = square + forward
+            targets = captures[square] & theirs
+            if not occupied >> one & 1:
+                targets |= 1 << one
+                if START_ROWS[color] >> square & 1 and not occupied >> (one + forward) & 1:
+                    targets |= 1 << (one + forward)
+            for target in squares(targets & allowed & pins[square]):
+                if lastRow >> target & 1:
+                    for promotion in PROMOTIONS:
+                        append(Move(square, target, promotion))
+                else:
+                    append(Move(square, target, None, DOUBLE_PUSH if target == one + forward else QUIET))
+
+        if self.enPassant is not None and self.enPassant[0] == EN_PASSANT_ROWS[color]:
+            epSquare = self.enPassant[0] * 8 + self.enPassant[1]
+            for square in squares(PAWN_CAPTURE_MASKS[enemy][epSquare] & pawns):
+                move = Move(square, epSquare, None, EN_PASSANT)
+                self.makeMove(move)
+                if not self.kingInCheck(color):
+                    append(move)
+                self.unmakeMove()
+        return moves
+
+    def isLegalMove(self, move: Move) -> bool:
+        """Whether a move that follows the piece's rules leaves the mover's
+        king safe, castling's squares are checked by legalMoves instead"""
+        color = self.turn
+        if move.flag == EN_PASSANT:
+            self.makeMove(move)
+            safe = not self.kingInCheck(color)
+            self.unmakeMove()
+            return safe
+        enemy = 'black' if color == 'white' else 'white'
+        occupied = self.occupied['white'] | self.occupied['black']
+        kingSquare = self.masks[(King, color)].bit_length() - 1
+        if move.start == kingSquare:
+            return not self.attackerMask(move.end, enemy, occupied ^ (1 << kingSquare))
+        checkers = self.attackerMask(kingSquare, enemy, occupied)
+        if checkers:
+            if checkers & (checkers - 1):
+                return False
+            allowed = checkers | BETWEEN[kingSquare].get(checkers.bit_length() - 1, 0)
+            if not allowed >> move.end & 1:
+                return False
+        line = self.pinLines(color, kingSquare, occupied).get(move.start)
+        return line is None or line >> move.end & 1 == 1
+
+    def attackersTo(self, square: str, color: str, pieceType=None) -> list:
+        """Same as Chessboard.attackersTo, off the masks"""
+        target = self.toIndexes(square)
+        if not target:
+            return []
+        row, col = target
+        occupant = self.board[row][col]
+        if occupant.color == color:
+            return []
+        index = row * 8 + col
+        masks = self.masks
+        found = 0
+        if pieceType is None or pieceType is Knight:
+            found |= KNIGHT_MASKS[index] & masks[(Knight, color)]
+        if pieceType is None or pieceType is King:
+            found |= KING_MASKS[index] & masks[(King, color)]
+        if pieceType is not Pawn and pieceType is not Knight and pieceType is not King:
+            occupied = self.occupied['white'] | self.occupied['black']
+            if pieceType is not Bishop:
+                straight = (masks[(Queen, color)] | masks[(Rook, color)] if pieceType is None
+                            else masks[(pieceType, color)])
+                if straight:
+                    found |= slide(index, STRAIGHT_RAYS, occupied) & straight
+            if pieceType is not Rook:
+                diagonal = (masks[(Queen, color)] | masks[(Bishop, color)] if pieceType is None
+                            else masks[(pieceType, color)])
+                if diagonal:
+                    found |= slide(index, DIAGONAL_RAYS, occupied) & diagonal
+
+        board = self.board
+        pieces = [board[at >> 3][at & 7] for at in squares(found)]
+        if pieceType is None or pieceType is Pawn:
+            pieces += self.pawnsTo(row, col, color, occupant is not EMPTY)
+        return pieces
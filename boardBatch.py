@@ -0,0 +1,266 @@
+"""Lots of positions at once as NumPy arrays, for scoring millions of them
+offline without a Chessboard per position.
+
+A BoardBatch holds N positions as an (N, 12) array of 64 bit masks, one per
+piece kind and color in boardIO's code order (white PNBRQK then black), laid
+out like bitBoard's with bit row * 8 + col, plus whose turn it is, castling
+rights and the en passant square. Everything it works out (material,
+piece-square scores, attack counts and mobility) is a handful of shifts and
+ands over the whole batch instead of a loop per position. Positions go in and
+out through boardIO's packed 32 byte records, which is also how a position
+database stores them, so a whole database file loads without replaying a
+single move. Needs numpy, bit counts use np.bitwise_count on numpy 2.0 and
+later and a shift and add count before that.
+
+ex. batch = BoardBatch.fromBoards(boards)
+    batch.pieceSquare()  # same as each board's pieceScore
+    python boardBatch.py score games.db
+    python boardBatch.py bench --positions 1000000"""
+import argparse
+import random
+import time
+import numpy as np
+from attackTables import DIRECTIONS, STRAIGHT, DIAGONAL, KNIGHT_JUMPS, KING_STEPS
+from chessBoard import Chessboard
+from boardIO import packBoard, unpackBoard, PACKED_SIZE, PASSED_PAWN, CASTLING_ROOK, BLACK_KING_TO_MOVE
+from evaluate import MOBILITY
+from moveGen import generateLegalMoves
+from pieceSquare import PIECE_VALUES, PIECE_SQUARE
+from positionDB import HEADER, SLOT
+
+LETTERS = 'PNBRQK'
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6) # mask + 6 for black
+WHITE, BLACK = 0, 1
+ROOK_SQUARES = (63, 56, 7, 0) # where boardIO marks the castling rooks, KQkq
+VALUES = np.array([PIECE_VALUES[letter] for letter in LETTERS] +
+                  [-PIECE_VALUES[letter] for letter in LETTERS], dtype=np.int32)
+SQUARE_SCORES = np.array([PIECE_SQUARE[(letter, color)] for color in ('white', 'black')
+                          for letter in LETTERS], dtype=np.int32) # (12, 64)
+ROWS = [np.uint64(0xFF << (row * 8)) for row in range(8)]
+M1, M2, M4 = np.uint64(0x5555555555555555), np.uint64(0x3333333333333333), np.uint64(0x0F0F0F0F0F0F0F0F)
+BYTE_SUM = np.uint64(0x0101010101010101)
+
+def shiftAddCount(masks) -> np.ndarray:
+    """Set bits in each 64 bit mask, what np.bitwise_count gives on numpy 2.0"""
+    masks = masks - ((masks >> np.uint64(1)) & M1)
+    masks = (masks & M2) + ((masks >> np.uint64(2)) & M2)
+    masks = (masks + (masks >> np.uint64(4))) & M4
+    return ((masks * BYTE_SUM) >> np.uint64(56)).astype(np.uint8)
+
+popcount = getattr(np, 'bitwise_count', shiftAddCount)
+
+SLOTS = np.dtype([('hash', '<u8'), ('board', 'u1', PACKED_SIZE), ('games', '<u4'),
+                  ('rest', 'V', SLOT.size - 8 - PACKED_SIZE - 4)])
+
+def makeStep(dRow: int, dCol: int):
+    """(keep, shift) for moving a mask dRow rows and dCol cols, keep drops the
+    cols that would wrap round a side before shifting"""
+    cols = [col for col in range(8) if 0 <= col + dCol < 8]
+    keep = sum(1 << (row * 8 + col) for row in range(8) for col in cols)
+    return np.uint64(keep), dRow * 8 + dCol
+
+def step(masks: np.ndarray, keep: np.uint64, shift: int) -> np.ndarray:
+    masks = masks & keep
+    return masks << np.uint64(shift) if shift > 0 else masks >> np.uint64(-shift)
+
+KNIGHT_STEPS = [makeStep(dRow, dCol) for dRow, dCol in KNIGHT_JUMPS]
+KING_MOVES = [makeStep(dRow, dCol) for dRow, dCol in KING_STEPS]
+SLIDES = {name: makeStep(*DIRECTIONS[name]) for name in DIRECTIONS}
+PAWN_CAPTURES = [[makeStep(-1, -1), makeStep(-1, 1)], [makeStep(1, -1), makeStep(1, 1)]]
+PAWN_PUSH = [makeStep(-1, 0), makeStep(1, 0)]
+
+def bits(masks: np.ndarray) -> np.ndarray:
+    """(..., 64) 0/1 for every square of (...) masks"""
+    return np.unpackbits(masks.view(np.uint8).reshape(masks.shape + (8,)), axis=-1, bitorder='little')
+
+class BoardBatch:
+    def __init__(self, pieces: np.ndarray, whiteToMove: np.ndarray,
+                 castling: np.ndarray, enPassant: np.ndarray) -> None:
+        self.pieces = pieces           # (N, 12) uint64
+        self.whiteToMove = whiteToMove # (N,) bool
+        self.castling = castling       # (N, 4) bool, KQkq
+        self.enPassant = enPassant     # (N,) square row * 8 + col, -1 for none
+
+    def __len__(self) -> int:
+        return len(self.pieces)
+
+    @classmethod
+    def fromPacked(cls, data) -> 'BoardBatch':
+        """A batch from boardIO packed records back to back, bytes or a uint8
+        array of N * 32"""
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, PACKED_SIZE)
+        codes = np.empty((len(raw), 64), dtype=np.uint8)
+        codes[:, 0::2] = raw >> 4
+        codes[:, 1::2] = raw & 15
+        rows = np.arange(64) >> 3
+
+        whiteToMove = ~(codes == BLACK_KING_TO_MOVE).any(axis=1)
+        castling = codes[:, ROOK_SQUARES] == CASTLING_ROOK
+        passed = codes == PASSED_PAWN
+        pawnSquare = passed.argmax(axis=1)
+        # the square skipped is behind the pawn, white's are on row 4
+        enPassant = np.where(passed.any(axis=1), np.where(pawnSquare >> 3 == 4, pawnSquare + 8, pawnSquare - 8), -1)
+
+        # back to plain piece codes now the extra information is out
+        codes = np.where(passed, np.where(rows == 4, 1 + PAWN, 7 + PAWN), codes)
+        codes = np.where(codes == CASTLING_ROOK, np.where(rows == 7, 1 + ROOK, 7 + ROOK), codes)
+        codes = np.where(codes == BLACK_KING_TO_MOVE, 7 + KING, codes)
+        onehot = codes[:, None, :] == np.arange(1, 13, dtype=np.uint8)[None, :, None]
+        pieces = np.packbits(onehot, axis=-1, bitorder='little').view('<u8').reshape(-1, 12)
+        return cls(pieces.astype(np.uint64), whiteToMove, castling, enPassant.astype(np.int8))
+
+    @classmethod
+    def fromBoards(cls, boards) -> 'BoardBatch':
+        return cls.fromPacked(b''.join(packBoard(chessboard) for chessboard in boards))
+
+    @classmethod
+    def fromPositionDB(cls, path: str) -> 'BoardBatch':
+        """Every position in a positionDB file, straight off the slots"""
+        slots = np.fromfile(path, dtype=SLOTS, offset=HEADER.size)
+        return cls.fromPacked(slots['board'][slots['games'] > 0].tobytes())
+
+    def toPacked(self) -> bytes:
+        codes = (bits(self.pieces) * np.arange(1, 13, dtype=np.uint8)[:, None]).sum(axis=1, dtype=np.uint8)
+        n = np.arange(len(self))
+        hasPassed = self.enPassant >= 0
+        pawnSquare = np.where(self.enPassant >> 3 == 5, self.enPassant - 8, self.enPassant + 8)
+        codes[n[hasPassed], pawnSquare[hasPassed]] = PASSED_PAWN
+        for right, square in enumerate(ROOK_SQUARES):
+            codes[self.castling[:, right], square] = CASTLING_ROOK
+        codes[~self.whiteToMove[:, None] & (codes == 7 + KING)] = BLACK_KING_TO_MOVE
+        return (codes[:, 0::2] << 4 | codes[:, 1::2]).tobytes()
+
+    def toBoards(self, boardType=Chessboard) -> list:
+        data = self.toPacked()
+        return [unpackBoard(data[i:i + PACKED_SIZE], boardType)
+                for i in range(0, len(data), PACKED_SIZE)]
+
+    def occupied(self, color: int) -> np.ndarray:
+        return np.bitwise_or.reduce(self.pieces[:, 6 * color:6 * color + 6], axis=1)
+
+    def material(self) -> np.ndarray:
+        """(N,) material from white's side"""
+        return popcount(self.pieces).astype(np.int32) @ VALUES
+
+    def pieceSquare(self) -> np.ndarray:
+        """(N,) material and piece-square score from white's side, the same
+        number as Chessboard.pieceScore"""
+        return np.einsum('npq,pq->n', bits(self.pieces), SQUARE_SCORES)
+
+    def attackSets(self, color: int, pawns: bool = True) -> list:
+        """Masks of the squares color attacks, split up so no square is in one
+        mask for two attackers: one per knight jump, king step, pawn capture
+        and slider direction (two sliders going the same way can't both
+        reach a square, the one behind stops at the other). Adding the masks
+        up square by square gives Chessboard.attacks' counts"""
+        pieces = self.pieces[:, 6 * color:6 * color + 6]
+        empty = ~(self.occupied(WHITE) | self.occupied(BLACK))
+        sets = []
+        if pawns:
+            sets += [step(pieces[:, PAWN], *move) for move in PAWN_CAPTURES[color]]
+        sets += [step(pieces[:, KNIGHT], *move) for move in KNIGHT_STEPS]
+        sets += [step(pieces[:, KING], *move) for move in KING_MOVES]
+        for directions, kinds in ((STRAIGHT, (ROOK, QUEEN)), (DIAGONAL, (BISHOP, QUEEN))):
+            sliders = pieces[:, kinds[0]] | pieces[:, kinds[1]]
+            for direction in directions:
+                ray = step(sliders, *SLIDES[direction])
+                reached = ray
+                for i in range(6):
+                    ray = step(ray & empty, *SLIDES[direction]) # only carries on through empty squares
+                    reached |= ray
+                sets.append(reached)
+        return sets
+
+    def attacks(self) -> np.ndarray:
+        """(N, 2, 64) attack counts for white and black, Chessboard.attacks
+        for every position"""
+        return np.stack([sum(bits(mask).astype(np.int16) for mask in self.attackSets(color))
+                         for color in (WHITE, BLACK)], axis=1)
+
+    def attackTotal(self, color: int) -> np.ndarray:
+        """(N,) sum of color's attack counts"""
+        return sum(popcount(mask).astype(np.int32) for mask in self.attackSets(color))
+
+    def mobility(self, color: int) -> np.ndarray:
+        """(N,) color's pseudo legal moves without castling, promotions count
+        once per piece they can become"""
+        own, enemy = self.occupied(color), self.occupied(1 - color)
+        empty = ~(own | enemy)
+        moves = sum(popcount(mask & ~own).astype(np.int32)
+                    for mask in self.attackSets(color, pawns=False))
+
+        pawns = self.pieces[:, 6 * color + PAWN]
+        lastRow, pushRow = (ROWS[0], ROWS[5]) if color == WHITE else (ROWS[7], ROWS[2])
+        # only the side to move can take en passant, it's the row behind their target
+        hasPassed = (self.enPassant >> 3) == (2 if color == WHITE else 5)
+        ep = np.where(hasPassed, np.uint64(1) << np.maximum(self.enPassant, 0).astype(np.uint64), np.uint64(0))
+        single = step(pawns, *PAWN_PUSH[color]) & empty
+        double = step(single & pushRow, *PAWN_PUSH[color]) & empty
+        captures = [step(pawns, *move) & (enemy | ep) for move in PAWN_CAPTURES[color]]
+        for landing in [single] + captures:
+            # promotions are four moves
+            moves += popcount(landing).astype(np.int32) + 3 * popcount(landing & lastRow)
+        return moves + popcount(double)
+
+    def scores(self) -> np.ndarray:
+        """(N,) evaluate's material, piece-square and mobility terms for the
+        side to move, pawn structure and king safety are left to evaluate"""
+        score = self.pieceSquare() + MOBILITY * (self.attackTotal(WHITE) - self.attackTotal(BLACK))
+        return np.where(self.whiteToMove, score, -score)
+
+def randomPositions(count: int, seed: int = 0) -> list:
+    """count positions from random games, for benchmarking"""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        chessboard = Chessboard()
+        for ply in range(rng.randrange(10, 80)):
+            moves = generateLegalMoves(chessboard, chessboard.turn)
+            if not moves:
+                break
+            chessboard.makeMove(rng.choice(moves))
+        boards.append(chessboard)
+    return boards
+
+def bench(positions: int):
+    """Scores positions packed positions (a few hundred random ones over and
+    over) with a batch and then one unpacked Chessboard at a time"""
+    boards = randomPositions(min(positions, 500))
+    data = b''.join(packBoard(chessboard) for chessboard in boards)
+    data = (data * (positions // len(boards) + 1))[:positions * PACKED_SIZE]
+
+    start = time.perf_counter()
+    batch = BoardBatch.fromPacked(data)
+    batch.scores()
+    batch.mobility(WHITE)
+    batch.mobility(BLACK)
+    elapsed = time.perf_counter() - start
+    print(f'batch: {len(batch)} positions in {elapsed:.2f}s ({len(batch) / elapsed:.0f} positions/s)')
+
+    count = min(positions, 20000)
+    start = time.perf_counter()
+    for i in range(0, count * PACKED_SIZE, PACKED_SIZE):
+        chessboard = unpackBoard(data[i:i + PACKED_SIZE])
+        chessboard.pieceScore + MOBILITY * (sum(chessboard.attacks['white']) - sum(chessboard.attacks['black']))
+    elapsed = time.perf_counter() - start
+    print(f'one board at a time: {count} positions in {elapsed:.2f}s ({count / elapsed:.0f} positions/s)')
+
+def main():
+    parser = argparse.ArgumentParser(description='score lots of positions at once')
+    commands = parser.add_subparsers(dest='command', required=True)
+    score = commands.add_parser('score', help='score every position in a positionDB file')
+    score.add_argument('database')
+    timing = commands.add_parser('bench', help='positions per second')
+    timing.add_argument('--positions', type=int, default=1000000)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        bench(args.positions)
+        return 0
+    batch = BoardBatch.fromPositionDB(args.database)
+    scores = batch.scores()
+    print(f'{len(batch)} positions, mean {scores.mean():.1f} min {scores.min()} max {scores.max()}')
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+"""Loading and saving Chessboard positions, as FEN text or as a packed 32 byte
+binary record for storing lots of positions.
+
+The packed record is one nibble per square, a8 first, with the high nibble
+of each byte holding the even square. 0 is empty, 1-6 are white PNBRQK and
+7-12 black. The other three codes fold in the rest of the position:
+    13  a pawn that can be taken en passant, its rank says its color
+    14  a rook that can still castle, its rank says its color
+    15  the black king when it is black to move"""
+from chessBoard import Chessboard, Chesspiece, EMPTY, Pawn, King, Queen, Bishop, Knight, Rook, CASTLING, EN_PASSANT_ROWS
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+PIECES = {'P': Pawn, 'N': Knight, 'B': Bishop, 'R': Rook, 'Q': Queen, 'K': King}
+CODES = [None] + [(kind, 'white') for kind in PIECES.values()] + \
+        [(kind, 'black') for kind in PIECES.values()]
+PASSED_PAWN, CASTLING_ROOK, BLACK_KING_TO_MOVE = 13, 14, 15
+PACKED_SIZE = 32
+
+def makePiece(kind, color: str, row: int, col: int, castling: str) -> Chesspiece:
+    """A piece with hasMoved worked out from where it stands"""
+    piece = kind(color)
+    if kind is Pawn:
+        piece.hasMoved = row != (6 if color == 'white' else 1)
+    elif kind is King or kind is Rook:
+        # only the pieces a castling right still needs count as unmoved
+        piece.hasMoved = True
+        for right in castling:
+            kingFrom, kingTo, rookFrom, rookTo, between = CASTLING[right]
+            home = kingFrom if kind is King else rookFrom
+            if (right.isupper() == (color == 'white') and
+                    (8 - int(home[1]), ord(home[0]) - 97) == (row, col)):
+                piece.hasMoved = False
+    return piece
+
+def emptyRows() -> list:
+    return [[EMPTY] * 8 for row in range(8)]
+
+def boardFromFen(fen: str, boardType=Chessboard) -> Chessboard:
+    """ex. boardFromFen('8/8/8/8/8/8/8/K6k w - - 0 1'), raises ValueError on
+    anything that isn't a FEN, including a side without exactly one king, a
+    castling right without its king and rook at home or an en passant square
+    the side to move couldn't take on"""
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f'not a FEN: {fen}')
+    placement, turn, castling, enPassant = fields[:4]
+    castling = '' if castling == '-' else castling
+    ranks = placement.split('/')
+    if len(ranks) != 8 or turn not in ('w', 'b') or any(c not in CASTLING for c in castling):
+        raise ValueError(f'not a FEN: {fen}')
+
+    rows = emptyRows()
+    for row, rank in enumerate(ranks):
+        col = 0
+        for char in rank:
+            if char.isdigit():
+                col += int(char)
+                continue
+            if char.upper() not in PIECES or col > 7:
+                raise ValueError(f'not a FEN: {fen}')
+            color = 'white' if char.isupper() else 'black'
+            rows[row][col] = makePiece(PIECES[char.upper()], color, row, col, castling)
+            col += 1
+        if col != 8:
+            raise ValueError(f'not a FEN: {fen}')
+
+    kings = [piece.color for rank in rows for piece in rank if type(piece) is King]
+    if sorted(kings) != ['black', 'white']:
+        raise ValueError(f'not a FEN: {fen}')
+    for right in castling:
+        color = 'white' if right.isupper() else 'black'
+        kingFrom, kingTo, rookFrom, rookTo, between = CASTLING[right]
+        for kind, home in ((King, kingFrom), (Rook, rookFrom)):
+            piece = rows[8 - int(home[1])][ord(home[0]) - 97]
+            if type(piece) is not kind or piece.color != color:
+                raise ValueError(f'not a FEN: {fen}')
+
+    turn = 'white' if turn == 'w' else 'black'
+    square = None
+    if enPassant != '-':
+        if (len(enPassant) != 2 or enPassant[0] not in 'abcdefgh' or
+                enPassant[1] != str(8 - EN_PASSANT_ROWS[turn])):
+            raise ValueError(f'not a FEN: {fen}')
+        square = (EN_PASSANT_ROWS[turn], ord(enPassant[0]) - 97)
+    return boardType.fromRows(rows, turn, castling, square)
+
+def fenClocks(fen: str) -> tuple:
+    """(halfmoves, fullmoves) off the end of a FEN, 0 and 1 if it leaves
+    them out"""
+    fields = fen.split()[4:6]
+    if not all(field.isdigit() for field in fields):
+        raise ValueError(f'not a FEN: {fen}')
+    halfmoves = int(fields[0]) if fields else 0
+    fullmoves = int(fields[1]) if len(fields) > 1 else 1
+    return halfmoves, max(fullmoves, 1)
+
+def boardToFen(chessboard: Chessboard, halfmoves: int = 0, fullmoves: int = 1) -> str:
+    ranks = []
+    for row in range(8):
+        rank, empty = '', 0
+        for col in range(8):
+            piece = chessboard.board[row][col]
+            if piece is EMPTY:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += piece.letter if piece.color == 'white' else piece.letter.lower()
+        ranks.append(rank + (str(empty) if empty else ''))
+
+    enPassant = '-'
+    if chessboard.enPassant is not None:
+        enPassant = chessboard.positions[chessboard.enPassant[0]][chessboard.enPassant[1]]
+    # keep FEN's KQkq order whatever order the rights were lost in
+    castling = ''.join(right for right in 'KQkq' if right in chessboard.castling) or '-'
+    turn = 'w' if chessboard.turn == 'white' else 'b'
+    return f'{"/".join(ranks)} {turn} {castling} {enPassant} {halfmoves} {fullmoves}'
+
+def packBoard(chessboard: Chessboard) -> bytes:
+    codes = [0] * 64
+    for (kind, color), located in chessboard.pieceIndex.items():
+        code = CODES.index((kind, color))
+        for (row, col) in located:
+            codes[row * 8 + col] = code
+
+    if chessboard.enPassant is not None:
+        row, col = chessboard.enPassant
+        # the pawn that moved two is one row past the square it skipped
+        codes[(row + (1 if row == 2 else -1)) * 8 + col] = PASSED_PAWN
+    for right in chessboard.castling:
+        rookFrom = CASTLING[right][2]
+        codes[(8 - int(rookFrom[1])) * 8 + ord(rookFrom[0]) - 97] = CASTLING_ROOK
+    if chessboard.turn == 'black':
+        row, col = chessboard.getKing('black').pos
+        codes[row * 8 + col] = BLACK_KING_TO_MOVE
+
+    return bytes(codes[i] << 4 | codes[i + 1] for i in range(0, 64, 2))
+
+# byte -> (even square code, odd square code), saves shifting on every decode
+NIBBLES = [(byte >> 4, byte & 15) for byte in range(256)]
+
+def unpackBoard(data: bytes, boardType=Chessboard) -> Chessboard:
+    if len(data) != PACKED_SIZE:
+        raise ValueError(f'packed positions are {PACKED_SIZE} bytes, got {len(data)}')
+    codes = []
+    for byte in data:
+        codes += NIBBLES[byte]
+
+    rows = emptyRows()
+    turn, castling, enPassant = 'white', '', None
+    rooks = []
+    for square, code in enumerate(codes):
+        if not code:
+            continue
+        row, col = square >> 3, square & 7
+        if code == PASSED_PAWN:
+            color = 'white' if row == 4 else 'black'
+            kind = Pawn
+            enPassant = (row + (1 if color == 'white' else -1), col)
+        elif code == CASTLING_ROOK:
+            color = 'white' if row == 7 else 'black'
+            kind = Rook
+            rooks.append((row, col))
+        elif code == BLACK_KING_TO_MOVE:
+            kind, color, turn = King, 'black', 'black'
+        else:
+            kind, color = CODES[code]
+        piece = kind(color)
+        if kind is Pawn:
+            piece.hasMoved = row != (6 if color == 'white' else 1)
+        elif kind is King or kind is Rook:
+            piece.hasMoved = kind is Rook # kings are sorted out below
+        rows[row][col] = piece
+
+    for right, (kingFrom, kingTo, rookFrom, rookTo, between) in CASTLING.items():
+        rook = (8 - int(rookFrom[1]), ord(rookFrom[0]) - 97)
+        if rook in rooks:
+            castling += right
+            rows[rook[0]][rook[1]].hasMoved = False
+    for row in rows:
+        for piece in row:
+            if isinstance(piece, King):
+                side = 'KQ' if piece.color == 'white' else 'kq'
+                piece.hasMoved = not any(right in castling for right in side)
+    # FEN order
+    castling = ''.join(right for right in 'KQkq' if right in castling)
+    return boardType.fromRows(rows, turn, castling, enPassant)
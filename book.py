@@ -0,0 +1,172 @@
+"""Polyglot .bin opening books, looked up through mmap so the engine doesn't
+have to think about positions any book already knows.
+
+A book is a list of 16 byte big endian entries (key, move, weight, learn)
+sorted by key, so the entries for a position are found by binary search
+without reading the rest of the file. Small books can be built from PGN
+files with no network needed.
+
+ex. python book.py build book.bin games.pgn --plies 16
+    python book.py probe book.bin"""
+import argparse
+import mmap
+import random
+import struct
+from chessBoard import Chessboard, Pawn
+from boardIO import boardFromFen, START_FEN
+from moveGen import moveFromUci, moveToUci
+from positionDB import gamePositions
+from zobrist import EN_PASSANT_KEYS
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+FILES = 'abcdefgh'
+PROMOTIONS = ' nbrq'
+# Polyglot writes castling as the king taking its own rook
+CASTLES = {'e1h1': 'e1g1', 'e1a1': 'e1c1', 'e8h8': 'e8g8', 'e8a8': 'e8c8'}
+
+def polyglotKey(chessboard: Chessboard) -> int:
+    """The board's hash with en passant only counted when a pawn of the side
+    to move is actually next to the pawn that moved two, like Polyglot does"""
+    key = chessboard.hash
+    if chessboard.enPassant is None:
+        return key
+    row, col = chessboard.enPassant
+    row += 1 if chessboard.turn == 'white' else -1
+    for pawnRow, pawnCol in chessboard.pieceIndex.get((Pawn, chessboard.turn), ()):
+        if pawnRow == row and abs(pawnCol - col) == 1:
+            return key
+    return key ^ EN_PASSANT_KEYS[col]
+
+def decodeMove(chessboard: Chessboard, code: int) -> str:
+    """Polyglot move bits to uci for chessboard's position"""
+    uci = (FILES[code >> 6 & 7] + str((code >> 9 & 7) + 1) +
+           FILES[code & 7] + str((code >> 3 & 7) + 1))
+    if code >> 12 & 7:
+        uci += PROMOTIONS[code >> 12 & 7]
+    if uci in CASTLES:
+        row, col = chessboard.toIndexes(uci[:2])
+        if chessboard.board[row][col].letter == 'K':
+            uci = CASTLES[uci]
+    return uci
+
+def encodeMove(chessboard: Chessboard, uci: str) -> int:
+    row, col = chessboard.toIndexes(uci[:2])
+    if chessboard.board[row][col].letter == 'K':
+        for rookTakes, castle in CASTLES.items():
+            if castle == uci:
+                uci = rookTakes
+    code = (FILES.index(uci[0]) << 6 | (int(uci[1]) - 1) << 9 |
+            FILES.index(uci[2]) | (int(uci[3]) - 1) << 3)
+    if len(uci) > 4:
+        code |= PROMOTIONS.index(uci[4]) << 12
+    return code
+
+class OpeningBook:
+    """ex.
+        with OpeningBook('book.bin') as book:
+            move = book.weightedMove(chessboard)"""
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.data) // ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def firstEntry(self, key: int) -> int:
+        """Index of the first entry with key or the one after where it would be"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, chessboard: Chessboard) -> list:
+        """(Move, weight) for every book move in chessboard's position that is
+        legal, heaviest first"""
+        key = polyglotKey(chessboard)
+        found = []
+        index = self.firstEntry(key)
+        while index < self.size:
+            entryKey, code, weight, learn = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entryKey != key:
+                break
+            move = moveFromUci(chessboard, decodeMove(chessboard, code))
+            if move is not None: # a bad entry or a key collision
+                found.append((move, weight))
+            index += 1
+        return sorted(found, key=lambda entry: -entry[1])
+
+    def bestMove(self, chessboard: Chessboard):
+        """The heaviest book move, None when out of book"""
+        found = self.entries(chessboard)
+        return found[0][0] if found else None
+
+    def weightedMove(self, chessboard: Chessboard, rng=random):
+        """A book move picked with odds by weight, None when out of book"""
+        found = [(move, weight) for move, weight in self.entries(chessboard) if weight]
+        if not found:
+            return None
+        pick = rng.randrange(sum(weight for move, weight in found))
+        for move, weight in found:
+            pick -= weight
+            if pick < 0:
+                return move
+
+def buildBook(paths: list, out: str, plies: int = 20) -> int:
+    """Writes a book of every move played in the first plies plies of the games
+    in paths, weighted by how often it was played. Returns the entry count"""
+    counts = {} # (key, move) -> times played
+    for chessboard, uci, result in gamePositions(paths):
+        if uci is None or len(chessboard.history) >= plies:
+            continue
+        entry = (polyglotKey(chessboard), encodeMove(chessboard, uci))
+        counts[entry] = counts.get(entry, 0) + 1
+
+    most = max(counts.values(), default=1)
+    scale = min(1.0, 0xffff / most)
+    with open(out, 'wb') as file:
+        for (key, code), played in sorted(counts.items()):
+            file.write(ENTRY.pack(key, code, max(int(played * scale), 1), 0))
+    return len(counts)
+
+def main():
+    parser = argparse.ArgumentParser(description='Polyglot opening books')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a book from PGN files')
+    build.add_argument('book')
+    build.add_argument('files', nargs='+')
+    build.add_argument('--plies', type=int, default=20, help='how deep into each game')
+    probe = commands.add_parser('probe', help='book moves for one position')
+    probe.add_argument('book')
+    probe.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f'{buildBook(args.files, args.book, args.plies)} entries')
+        return 0
+    chessboard = boardFromFen(args.fen)
+    with OpeningBook(args.book) as book:
+        found = book.entries(chessboard)
+    print(f'key {polyglotKey(chessboard):016x}')
+    for move, weight in found:
+        print(f'{moveToUci(chessboard, move)} {weight}')
+    return 0 if found else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,113 +1,199 @@
+from typing import NamedTuple
+from zobrist import PIECE_KEYS, EN_PASSANT_KEYS, castlingKey, turnKey, hashBoard
+from pieceSquare import PIECE_SQUARE, scoreBoard
+from attackTables import (
+    KNIGHT_MOVES, KING_MOVES, RAYS, PAWN_PUSHES, PAWN_CAPTURES, STRAIGHT, DIAGONAL,
+    KNIGHT_TARGETS, KING_TARGETS, RAY_TARGETS, RAY_DIRECTIONS, PAWN_CAPTURE_TARGETS
+)
+
+
+# move flags
+QUIET, DOUBLE_PUSH, EN_PASSANT, CASTLE = 0, 1, 2, 3
+# row each color takes en passant onto, the one the other side's pawns skip
+EN_PASSANT_ROWS = {'white': 2, 'black': 5}
+
+# castling right: king from, king to, rook from, rook to, squares that have to be empty
+CASTLING = {
+    'K': ('e1', 'g1', 'h1', 'f1', ('f1', 'g1')),
+    'Q': ('e1', 'c1', 'a1', 'd1', ('b1', 'c1', 'd1')),
+    'k': ('e8', 'g8', 'h8', 'f8', ('f8', 'g8')),
+    'q': ('e8', 'c8', 'a8', 'd8', ('b8', 'c8', 'd8')),
+}
+
+class Move(NamedTuple):
+    """squares are row * 8 + col on the board"""
+    start: int
+    end: int
+    promotion: type = None # piece class a pawn turns into
+    flag: int = QUIET
 
 class Chesspiece:
+    # no __dict__ per piece, everything that's the same for a kind lives on the class
+    __slots__ = ('color', 'pos')
+    directions = () # rays a slider moves along, the only attacks pieces can block
+    symbols = {None: '~'} # color -> how it's printed
+
     def __init__(self, row=-1, col=-1) -> None:
-        self.strRep = '~'
         self.color = None
         self.pos = (row, col)
+
+    @property
+    def strRep(self) -> str:
+        return self.symbols[self.color]
     
     def __str__(self):
         return self.strRep
-    
-    def __eq__(self, other):
-        return True if self.strRep == other else False
 
     def canMoveTo(self, move: str, chessboard):
         return False # just so my program doesn't get confused
 
+    def attackedSquares(self, chessboard) -> list:
+        """Squares (row * 8 + col) this piece attacks, whatever is on them"""
+        return self.slideSquares(self.directions, chessboard)
+
     def checkKnightMoves(self, chessboard):
         row, col = self.pos
-        up = row + 2
-        down = row - 2
-        left = col - 2
-        right = col + 2
-        coords = [
-                    (up, col + 1), (up, col - 1),
-            (row + 1, left),            (row + 1, right),
-            (row - 1, left),            (row - 1, right),
-                  (down, col + 1), (down, col - 1)
-        ]
-
-        coords = [
-            (row, col) for row, col in coords 
-            if chessboard.isOnBoard(row, col)
-        ]
-
-        return [chessboard.board[row][col] for row, col in coords]
+        return [chessboard.board[r][c] for r, c in KNIGHT_MOVES[row * 8 + col]]
     
     # this is a fundamental moving technique for multiple pieces
     def checkDiagonals(self, chessboard):
         # four diagonals we need to take into account
-        row, col = self.pos
-        downRight, downLeft, upRight, upLeft = [], [], [], []
-
-        for i in range(1,8): # in any position can only have at most 7 diagonal moves
-            if chessboard.isOnBoard(row + i, col + i):
-                downRight.append(chessboard.board[row + i][col + i]) # downRight
-
-            if chessboard.isOnBoard(row + i, col - i):
-                downLeft.append(chessboard.board[row + i][col - i])  # downLeft
-
-            if chessboard.isOnBoard(row - i, col + i):
-                upRight.append(chessboard.board[row - i][col + i])   # upRight
-
-            if chessboard.isOnBoard(row - i, col - i):
-                upLeft.append(chessboard.board[row - i][col - i])    # upLeft  
-
-        return [downRight, downLeft, upRight, upLeft]
+        rays = RAYS[self.pos[0] * 8 + self.pos[1]]
+        board = chessboard.board
+        return [
+            [board[r][c] for r, c in rays[direction]]
+            for direction in ('downRight', 'downLeft', 'upRight', 'upLeft')
+        ]
 
     def checkFileHor(self, chessboard):
         # start from this piece pos, check left and right of it in row
-        row, col = self.pos  # position of this piece
-        allPieces = [chessboard.board[row][i] for i in range(8)]
-        leftPieces = allPieces[:col]
-        rightPieces = allPieces[col + 1:]
-        leftPieces.reverse() # want the first element to be the first after this piece
-
-        return [leftPieces, rightPieces]
+        # the first element is the first square after this piece
+        rays = RAYS[self.pos[0] * 8 + self.pos[1]]
+        board = chessboard.board
+        return [
+            [board[r][c] for r, c in rays['left']],
+            [board[r][c] for r, c in rays['right']]
+        ]
 
     def checkFileVer(self, chessboard):
         # column will not change but need to see what's in all the rows
-        row, col = self.pos
-        columnPieces = [chessboard.board[i][col] for i in range(8)]
-        aboveThis = columnPieces[:row]
-        belowThis = columnPieces[row + 1:]
-        aboveThis.reverse() 
-        
-        return [aboveThis, belowThis]
+        rays = RAYS[self.pos[0] * 8 + self.pos[1]]
+        board = chessboard.board
+        return [
+            [board[r][c] for r, c in rays['up']],
+            [board[r][c] for r, c in rays['down']]
+        ]
 
     # I have to do this for ever chess move
-    def checkMoves(self, check: list, chessboard):
-        possibleMoves = []
-        for list in check:
-            for piece in list:
-                if piece == '~':
-                    possibleMoves.append(piece)
-                elif piece.color != self.color:
-                    possibleMoves.append(piece)
-                    break
-                else:
+    def canSlideTo(self, move: str, directions: tuple, chessboard):
+        """walks the rays in directions until it hits the move square or a
+        piece in the way"""
+        target = chessboard.toIndexes(move)
+        rays = RAYS[self.pos[0] * 8 + self.pos[1]]
+        board = chessboard.board
+        for direction in directions:
+            for square in rays[direction]:
+                piece = board[square[0]][square[1]]
+                if square == target:
+                    return piece.color != self.color
+                if piece is not EMPTY:
                     break
-        # now convert the valid moves into chess notation to check the move
-        if possibleMoves:
-            notation = chessboard.positions # p for piece
-            possibleMoves = [notation[p.pos[0]][p.pos[1]] for p in possibleMoves]
-        
-        return possibleMoves
+        return False
+
+    def slideSquares(self, directions: tuple, chessboard) -> list:
+        """Squares along the rays in directions up to and including the
+        first piece in the way"""
+        row, col = self.pos
+        return [
+            square for direction in directions
+            for square in chessboard.slideRay(row, col, direction)
+        ]
+
+class EmptySquare(Chesspiece):
+    """What's on every empty square. There is only the one, EMPTY, so an empty
+    square is checked with `is EMPTY` and clearing a square allocates nothing"""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'EMPTY' # pickles by name so other processes get their own EMPTY
+
+EMPTY = EmptySquare()
 
 class Chessboard:
-    isReversed = False
-    positions = [
-        [chr(97+i) + str(j) for i in range(0,8)]
+    # squares never move, row 0 is rank 8 and reversing only changes how the
+    # board is printed so these are the same for every board
+    positions = tuple(
+        tuple(chr(97+i) + str(j) for i in range(0,8))
         for j in range(8, 0, -1)
-    ]
-    files = [chr(97+i) for i in range(0,8)]
-    
+    )
+    files = tuple(chr(97+i) for i in range(0,8))
+    isReversed = False # True when printed with white at the top
+    # backends with their own legalMoves() and isLegalMove() set this, moveGen
+    # hands them the work instead of walking board
+    generatesMoves = False
+
 
     def __init__(self) -> None:
-        self.board = [[Chesspiece() for i in range(8)] for j in range(8)]
+        self.board = [[EMPTY] * 8 for j in range(8)]
         self.setBackrows()
         self.setPawnRows()
+        self.setPosition(self.board)
+
+    @classmethod
+    def fromRows(cls, rows: list, turn='white', castling='KQkq', enPassant=None):
+        """A board holding rows (8 lists of 8 pieces, row 0 is rank 8) without
+        setting up the starting position first"""
+        chessboard = cls.__new__(cls)
+        chessboard.setPosition(rows, turn, castling, enPassant)
+        return chessboard
+
+    def setPosition(self, rows: list, turn='white', castling='KQkq', enPassant=None):
+        """Replaces the whole position and rebuilds everything kept about it,
+        backends that keep more state rebuild theirs here too"""
+        self.board = rows
         self.setAllPositions()
+        self.buildIndex()
+        self.rebuildAttacks()
+        # square a pawn can be taken en passant on, (row, col) or None
+        self._enPassant = enPassant
+        self._turn = turn
+        self._castling = castling # rights left, same letters as FEN
+        self.history = []         # undo stack for makeMove()
+        # Zobrist key of the position, kept up to date as the board changes
+        self.hash = hashBoard(self)
+        # material and piece-square score from white's side, kept up to date the same way
+        self.pieceScore = scoreBoard(self)
+
+    # changing any of these changes the position so they go through the hash
+    @property
+    def enPassant(self):
+        return self._enPassant
+
+    @enPassant.setter
+    def enPassant(self, square):
+        if self._enPassant is not None:
+            self.hash ^= EN_PASSANT_KEYS[self._enPassant[1]]
+        if square is not None:
+            self.hash ^= EN_PASSANT_KEYS[square[1]]
+        self._enPassant = square
+
+    @property
+    def turn(self) -> str:
+        return self._turn
+
+    @turn.setter
+    def turn(self, color: str):
+        self.hash ^= turnKey(self._turn) ^ turnKey(color)
+        self._turn = color
+
+    @property
+    def castling(self) -> str:
+        return self._castling
+
+    @castling.setter
+    def castling(self, rights: str):
+        self.hash ^= castlingKey(self._castling) ^ castlingKey(rights)
+        self._castling = rights
 
     def setBackrows(self):
         backrow = lambda color : [
@@ -135,51 +221,133 @@ class Chessboard:
         """Set all the chesspiece's stored pos to their current row and col"""
         for i in range(len(self.board)):
             for j in range(len(self.board[i])):
-                self.board[i][j].pos = (i, j)
+                if self.board[i][j] is not EMPTY:
+                    self.board[i][j].pos = (i, j)
+
+    def viewRows(self, rows) -> list:
+        """rows (8 lists of 8) the way round they are printed"""
+        if self.isReversed:
+            return [row[::-1] for row in reversed(rows)]
+        return rows
 
     def printBoard(self):
-        for i in range(8):
-            for j in range(8):
-                print(self.board[i][j], end=' ')
+        for row in self.viewRows(self.board):
+            for piece in row:
+                print(piece, end=' ')
             print()
     
     def printPositions(self):
         """Prints the squares on the board in chess notation"""
-        for row in self.positions:
+        for row in self.viewRows(self.positions):
             for square in row:
                 print(square, end=' ')
             print()
 
     def printPiecesPos(self):
-        for row in self.board:
+        for row in self.viewRows(self.board):
             for piece in row:
                 print(piece.pos, end=' ')
             print()
 
     def reverseBoard(self):
-        self.board.reverse()
-        for list in self.board:
-            list.reverse()
-        # want the positons to correspond to the actual board too
-        self.positions.reverse()
-        for list in self.positions:
-            list.reverse()
-        self.files.reverse()
-        # handle the double reverses
-        self.isReversed = False if self.isReversed else True
-        # make sure the pieces know their positions!
-        self.setAllPositions()
+        """Flips which side is printed at the top, nothing on the board moves"""
+        self.isReversed = not self.isReversed
+
+    def buildIndex(self):
+        """Indexes every piece on the board by (type, color), each entry maps
+        (row, col) to the piece on it so finding pieces never scans the board"""
+        self.pieceIndex = {
+            (kind, color): {}
+            for kind in (Pawn, Knight, Bishop, Rook, Queen, King)
+            for color in ('white', 'black')
+        }
+        for row in self.board:
+            for piece in row:
+                if piece is not EMPTY:
+                    self.pieceIndex[(type(piece), piece.color)][piece.pos] = piece
+
+    def rebuildAttacks(self):
+        """Works out the squares every piece attacks from scratch, from then on
+        setPiece() and clearSquare() keep it up to date"""
+        self.attacks = {'white': [0] * 64, 'black': [0] * 64} # attackers of each square
+        self.attackers = {} # (row, col) -> (piece, squares it attacks) for non sliders
+        self.sliders = {}   # (row, col) -> (piece, {direction: squares it attacks}, square)
+        for located in self.pieceIndex.values():
+            for piece in located.values():
+                self.addAttacks(piece)
+
+    def slideRay(self, row: int, col: int, direction: str) -> list:
+        """Squares from row, col in direction up to and including the first piece"""
+        board = self.board
+        squares = []
+        for square in RAY_TARGETS[row * 8 + col][direction]:
+            squares.append(square)
+            if board[square >> 3][square & 7] is not EMPTY:
+                break
+        return squares
+
+    def addAttacks(self, piece: Chesspiece):
+        counts = self.attacks[piece.color]
+        if piece.directions:
+            rays = {direction: self.slideRay(*piece.pos, direction) for direction in piece.directions}
+            self.sliders[piece.pos] = (piece, rays, piece.pos[0] * 8 + piece.pos[1])
+            for squares in rays.values():
+                for square in squares:
+                    counts[square] += 1
+        else:
+            squares = piece.attackedSquares(self)
+            self.attackers[piece.pos] = (piece, squares)
+            for square in squares:
+                counts[square] += 1
+
+    def removeAttacks(self, piece: Chesspiece):
+        counts = self.attacks[piece.color]
+        if piece.directions:
+            entry = self.sliders.get(piece.pos)
+            if entry is not None and entry[0] is piece:
+                del self.sliders[piece.pos]
+                for squares in entry[1].values():
+                    for square in squares:
+                        counts[square] -= 1
+        else:
+            entry = self.attackers.get(piece.pos)
+            if entry is not None and entry[0] is piece:
+                del self.attackers[piece.pos]
+                for square in entry[1]:
+                    counts[square] -= 1
+
+    def updateSliders(self, row: int, col: int):
+        """Sliders reaching row, col see further or less far when something
+        lands on it or leaves it, only the one ray through it changes"""
+        square = row * 8 + col
+        for piece, rays, at in self.sliders.values():
+            direction = RAY_DIRECTIONS[at].get(square)
+            if direction in rays and square in rays[direction]:
+                counts = self.attacks[piece.color]
+                for old in rays[direction]:
+                    counts[old] -= 1
+                ray = rays[direction] = self.slideRay(at >> 3, at & 7, direction)
+                for new in ray:
+                    counts[new] += 1
+
+    def isAttacked(self, row: int, col: int, byColor: str) -> bool:
+        return self.attacks[byColor][row * 8 + col] > 0
+
+    def kingInCheck(self, color: str) -> bool:
+        row, col = self.getKing(color).pos
+        return self.attacks['black' if color == 'white' else 'white'][row * 8 + col] > 0
 
     def searchBoard(self, target: Chesspiece):
-        # linear search top to bottom, because there is no way to know where
-        # the pieces are with high level of certainty, well at least for me
+        # ex. if target is Pawn then add all the pawns of both colors
         pieces = []
-        for row in self.board:
-            for piece in row:
-                # ex. if piece is instance of Pawn then add piece to list
-                if isinstance(piece, target):
-                    pieces.append(piece)
+        for (kind, color), located in self.pieceIndex.items():
+            if issubclass(kind, target):
+                pieces += located.values()
         return pieces
+
+    def getPieces(self, kind, color) -> list:
+        """All the pieces of kind and color, ex. getPieces(Rook, 'white')"""
+        return list(self.pieceIndex[(kind, color)].values())
     
     def isOnBoard(self, row: int, col: int):
         # row == 0-7   col == 0-7
@@ -190,8 +358,7 @@ class Chessboard:
     def checkForCastle(self, color, kingside: bool):
         # check for space between rook and king of some color
         # make sure rook is on the board
-        rooks = self.searchBoard(Rook)
-        rooks = [rook for rook in rooks if rook.color == color]
+        rooks = self.getPieces(Rook, color)
         rooks = [rook for rook in rooks if not rook.hasMoved]
         if rooks:
             if kingside:
@@ -205,8 +372,7 @@ class Chessboard:
         return False
 
     def distanceKingToRook(self, color, rook: Chesspiece):
-        kings = self.searchBoard(King)
-        king = [king for king in kings if king.color == color][0]
+        king = self.getKing(color)
         # same row
         kingCol = king.pos[1]
         rookCol = rook.pos[1]
@@ -226,111 +392,316 @@ class Chessboard:
             pieces.append(self.board[row][col])
         return pieces
 
+    def attackersTo(self, square: str, color: str, pieceType=None) -> list:
+        """color's pieces that can move to square (ex. 'e4'), found by looking
+        outwards from the square instead of asking every piece. pieceType only
+        looks for that kind, pins aren't taken into account"""
+        target = self.toIndexes(square)
+        if not target:
+            return []
+        row, col = target
+        board = self.board
+        occupant = board[row][col]
+        if occupant.color == color:
+            return []
+        index = row * 8 + col
+        found = []
+
+        for kind, table in ((Knight, KNIGHT_MOVES), (King, KING_MOVES)):
+            if pieceType is None or pieceType is kind:
+                for r, c in table[index]:
+                    piece = board[r][c]
+                    if piece.color == color and type(piece) is kind:
+                        found.append(piece)
+
+        for directions, sliders in ((STRAIGHT, (Rook, Queen)), (DIAGONAL, (Bishop, Queen))):
+            if pieceType is not None and pieceType not in sliders:
+                continue
+            for direction in directions:
+                for r, c in RAYS[index][direction]:
+                    piece = board[r][c]
+                    if piece is not EMPTY:
+                        if (piece.color == color and type(piece) in sliders and
+                                (pieceType is None or type(piece) is pieceType)):
+                            found.append(piece)
+                        break
+
+        if pieceType is None or pieceType is Pawn:
+            found += self.pawnsTo(row, col, color, occupant is not EMPTY)
+        return found
+
+    def pinnedSquares(self, color: str) -> set:
+        """Squares of color's pieces that can't leave the line to their king"""
+        board = self.board
+        row, col = self.getKing(color).pos
+        rays = RAYS[row * 8 + col]
+        pinned = set()
+        for directions, sliders in ((STRAIGHT, (Rook, Queen)), (DIAGONAL, (Bishop, Queen))):
+            for direction in directions:
+                blocker = None
+                for r, c in rays[direction]:
+                    piece = board[r][c]
+                    if piece is EMPTY:
+                        continue
+                    if piece.color == color and blocker is None:
+                        blocker = r * 8 + c
+                        continue
+                    if piece.color != color and blocker is not None and type(piece) in sliders:
+                        pinned.add(blocker)
+                    break
+        return pinned
+
+    def pawnsTo(self, row: int, col: int, color: str, capture: bool) -> list:
+        """color's pawns that can push or (with capture or en passant) take onto row, col"""
+        board = self.board
+        if capture or (row == EN_PASSANT_ROWS[color] and (row, col) == self.enPassant):
+            # they sit where a pawn going the other way would capture from here
+            other = 'black' if color == 'white' else 'white'
+            return [
+                board[r][c] for r, c in PAWN_CAPTURES[other][row * 8 + col]
+                if board[r][c].color == color and type(board[r][c]) is Pawn
+            ]
+
+        back = 1 if color == 'white' else -1
+        if not 0 <= row + back < 8:
+            return []
+        piece = board[row + back][col]
+        if piece.color == color and type(piece) is Pawn:
+            return [piece]
+        startRow = 6 if color == 'white' else 1
+        if piece is EMPTY and row + 2 * back == startRow:
+            piece = board[startRow][col]
+            if piece.color == color and type(piece) is Pawn:
+                return [piece]
+        return []
+
     def getKing(self, color):
-        kings = self.searchBoard(King)
-        king = [king for king in kings if king.color == color][0]
-        return king
+        kings = self.pieceIndex[(King, color)]
+        return next(iter(kings.values()))
+
+    def toIndexes(self, move: str) -> tuple:
+        """Converts chess notation like e4 to row, col on this board, returns ()
+        if the move isn't a square"""
+        if len(move) != 2 or move[0] not in 'abcdefgh' or move[1] not in '12345678':
+            return ()
+        return 8 - int(move[1]), ord(move[0]) - 97
+
+    def setPiece(self, piece: Chesspiece, row: int, col: int):
+        """Puts piece on row, col and updates its pos\nWhatever was on that
+        square is overwritten, every change to the board should go through
+        here or clearSquare()"""
+        captured = self.board[row][col]
+        self.unindex(captured)
+        self.unindex(piece) # in case it wasn't cleared first
+        self.hashSquare(captured, row, col, -1)
+        if captured is not EMPTY:
+            self.removeAttacks(captured)
+        if piece is not EMPTY:
+            self.removeAttacks(piece)
+            piece.pos = (row, col)
+        self.board[row][col] = piece
+        if piece is not EMPTY:
+            self.pieceIndex[(type(piece), piece.color)][piece.pos] = piece
+            self.hashSquare(piece, row, col, 1)
+        # taking something doesn't change what's blocked, filling or emptying does
+        if (captured is EMPTY) != (piece is EMPTY):
+            self.updateSliders(row, col)
+        if piece is not EMPTY:
+            self.addAttacks(piece)
+
+    def clearSquare(self, row: int, col: int):
+        """Leaves an empty square at row, col"""
+        piece = self.board[row][col]
+        self.unindex(piece)
+        self.hashSquare(piece, row, col, -1)
+        self.board[row][col] = EMPTY
+        if piece is not EMPTY:
+            self.removeAttacks(piece)
+            self.updateSliders(row, col)
+
+    def hashSquare(self, piece: Chesspiece, row: int, col: int, sign: int):
+        """Toggles piece on row, col in and out of the hash, and adds (sign 1)
+        or takes away (sign -1) its score"""
+        if piece is not EMPTY:
+            self.hash ^= PIECE_KEYS[(piece.letter, piece.color)][row * 8 + col]
+            self.pieceScore += sign * PIECE_SQUARE[(piece.letter, piece.color)][row * 8 + col]
+
+    def unindex(self, piece: Chesspiece):
+        """Drops piece from pieceIndex if it's in there"""
+        if piece is not EMPTY:
+            located = self.pieceIndex[(type(piece), piece.color)]
+            if located.get(piece.pos) is piece:
+                del located[piece.pos]
+
+    def updateCastling(self):
+        """Drops any castling right whose king or rook has moved or been taken"""
+        rights = ''
+        for right in self.castling:
+            color = 'white' if right.isupper() else 'black'
+            kingFrom, kingTo, rookFrom, rookTo, between = CASTLING[right]
+            row, col = self.toIndexes(kingFrom)
+            king = self.board[row][col]
+            row, col = self.toIndexes(rookFrom)
+            rook = self.board[row][col]
+            if (isinstance(king, King) and king.color == color and not king.hasMoved and
+                isinstance(rook, Rook) and rook.color == color and not rook.hasMoved):
+                rights += right
+        self.castling = rights
+
+    def castleRook(self, move: Move) -> tuple:
+        """(rook from, rook to) as row, col for a castling move"""
+        for kingFrom, kingTo, rookFrom, rookTo, between in CASTLING.values():
+            if self.toIndexes(kingTo) == (move.end >> 3, move.end & 7):
+                return self.toIndexes(rookFrom), self.toIndexes(rookTo)
+
+    def makeMove(self, move: Move):
+        """Plays move for whoever's turn it is, everything needed to take it
+        back goes on history so unmakeMove() never has to copy the board"""
+        board = self.board
+        row, col = move.start >> 3, move.start & 7
+        toRow, toCol = move.end >> 3, move.end & 7
+        piece = board[row][col]
+        hasMoved = getattr(piece, 'hasMoved', None)
+
+        if move.flag == EN_PASSANT:
+            capturedAt = (row, toCol) # the pawn is beside us, not on the target
+        else:
+            capturedAt = (toRow, toCol)
+        captured = board[capturedAt[0]][capturedAt[1]]
+        if captured is EMPTY:
+            captured = None
+
+        self.history.append(
+            (move, piece, captured, capturedAt, hasMoved, self.enPassant, self.castling, self.hash)
+        )
+
+        if move.flag == EN_PASSANT:
+            self.clearSquare(*capturedAt)
+        self.clearSquare(row, col)
+        if move.promotion:
+            promoted = move.promotion(piece.color)
+            if hasattr(promoted, 'hasMoved'):
+                promoted.hasMoved = True
+            self.setPiece(promoted, toRow, toCol)
+        else:
+            self.setPiece(piece, toRow, toCol)
+        if hasMoved is not None:
+            piece.hasMoved = True
+
+        if move.flag == CASTLE:
+            (rRow, rCol), (rToRow, rToCol) = self.castleRook(move)
+            rook = board[rRow][rCol]
+            self.clearSquare(rRow, rCol)
+            self.setPiece(rook, rToRow, rToCol)
+            rook.hasMoved = True
+
+        self.enPassant = None
+        if move.flag == DOUBLE_PUSH:
+            self.enPassant = ((row + toRow) // 2, col)
+        if self.castling:
+            self.updateCastling()
+        self.turn = 'black' if self.turn == 'white' else 'white'
+
+    def unmakeMove(self):
+        """Takes back the last move played with makeMove()"""
+        move, piece, captured, capturedAt, hasMoved, enPassant, castling, key = self.history.pop()
+        row, col = move.start >> 3, move.start & 7
+        toRow, toCol = move.end >> 3, move.end & 7
+
+        if move.flag == CASTLE:
+            (rRow, rCol), (rToRow, rToCol) = self.castleRook(move)
+            rook = self.board[rToRow][rToCol]
+            self.clearSquare(rToRow, rToCol)
+            self.setPiece(rook, rRow, rCol)
+            rook.hasMoved = False # castling needs an unmoved rook
+
+        self.clearSquare(toRow, toCol)
+        self.setPiece(piece, row, col)
+        if hasMoved is not None:
+            piece.hasMoved = hasMoved
+        if captured is not None:
+            self.setPiece(captured, *capturedAt)
+        self._enPassant = enPassant
+        self._castling = castling
+        self._turn = 'black' if self._turn == 'white' else 'white'
+        self.hash = key
 
 class Rook(Chesspiece):
+    __slots__ = ('hasMoved',)
+    letter = 'R' # for notation
+    directions = STRAIGHT
+    symbols = {'white': '♜', 'black': '♖'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
         self.hasMoved = False
-        if color == 'white':
-            self.strRep = '♜'
-        else:
-            self.strRep = '♖'
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
-        horizontalMoves = self.checkFileHor(chessboard)
-        verticalMoves = self.checkFileVer(chessboard)
-        checkMoves = horizontalMoves + verticalMoves
-        possibleMoves = self.checkMoves(checkMoves, chessboard)
-        return True if move in possibleMoves else False
+        return self.canSlideTo(move, STRAIGHT, chessboard)
 
 class Knight(Chesspiece):
+    __slots__ = ()
+    letter = 'N' # for notation
+    symbols = {'white': '♞', 'black': '♘'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
-        if color == 'white':
-            self.strRep = '♞'
-        else:
-            self.strRep = '♘'
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
-        checkMoves = self.checkKnightMoves(chessboard)
-        possibleMoves = []
-        for piece in checkMoves:
-            if piece == '~' or piece.color != self.color:
-                possibleMoves.append(piece)
-
-        # now convert the valid moves into chess notation to check the move
-        if possibleMoves:
-            notation = chessboard.positions # p for piece
-            possibleMoves = [notation[p.pos[0]][p.pos[1]] for p in possibleMoves]
+        target = chessboard.toIndexes(move)
+        if target not in KNIGHT_MOVES[self.pos[0] * 8 + self.pos[1]]:
+            return False
+        # empty squares have no color so this covers empty or enemy
+        return chessboard.board[target[0]][target[1]].color != self.color
 
-        return True if move in possibleMoves else False
+    def attackedSquares(self, chessboard: Chessboard) -> tuple:
+        return KNIGHT_TARGETS[self.pos[0] * 8 + self.pos[1]]
 
 class Bishop(Chesspiece):
+    __slots__ = ()
+    letter = 'B' # for notation
+    directions = DIAGONAL
+    symbols = {'white': '♝', 'black': '♗'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
-        if color == 'white':
-            self.strRep = '♝'
-        else:
-            self.strRep = '♗'
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
-        checkMoves = self.checkDiagonals(chessboard)
-        possibleMoves = self.checkMoves(checkMoves, chessboard)
-        return True if move in possibleMoves else False
+        return self.canSlideTo(move, DIAGONAL, chessboard)
 
 class Queen(Chesspiece):
+    __slots__ = ()
+    letter = 'Q' # for notation
+    directions = STRAIGHT + DIAGONAL
+    symbols = {'white': '♛', 'black': '♕'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
-        if color == 'white':
-            self.strRep = '♛'
-        else:
-            self.strRep = '♕'
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
-        horizontalMoves = self.checkFileHor(chessboard)
-        verticalMoves = self.checkFileVer(chessboard)
-        diagonalMoves = self.checkDiagonals(chessboard)
-        # now we have to check if the moves are legitimate
-        checkMoves = horizontalMoves + verticalMoves + diagonalMoves
-        possibleMoves = self.checkMoves(checkMoves, chessboard)
-        return True if move in possibleMoves else False
+        return self.canSlideTo(move, STRAIGHT + DIAGONAL, chessboard)
 
 class King(Chesspiece):
+    __slots__ = ('hasMoved',)
+    letter = 'K' # for notation
+    symbols = {'white': '♚', 'black': '♔'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
-        if color == 'white':
-            self.strRep = '♚'
-        else:
-            self.strRep = '♔'
+        self.hasMoved = False
 
     def getPossibleMoves(self, chessboard: Chessboard):
         possibleMoves = []
-        row, col = self.pos
-        left, right = col - 1, col + 1
-        up, down = row - 1,  row + 1
-
-        coords = [ # all eight spaces around king
-            (up, left),   (up, col),   (up, right), 
-            (row, left),               (row, right), 
-            (down, left), (down, col), (down, right)
-        ]
-        for coord in coords:
-            row, col = coord # row, col of this coord
-            onBoard = chessboard.isOnBoard(row, col)
-            if onBoard: # can't access what isn't on the board
-                empty = chessboard.board[row][col] == '~'
-                enemy = chessboard.board[row][col].color != self.color
-                if empty or enemy:
-                    possibleMoves.append(chessboard.positions[row][col])
+        # all the spaces around king that are on the board
+        for row, col in KING_MOVES[self.pos[0] * 8 + self.pos[1]]:
+            # empty or enemy
+            if chessboard.board[row][col].color != self.color:
+                possibleMoves.append(chessboard.positions[row][col])
 
         return possibleMoves
     
@@ -338,58 +709,44 @@ class King(Chesspiece):
         return len(self.getPossibleMoves(chessboard)) != 0
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
-        possibleMoves = self.getPossibleMoves(chessboard)
-        return True if move in possibleMoves else False
+        target = chessboard.toIndexes(move)
+        if target not in KING_MOVES[self.pos[0] * 8 + self.pos[1]]:
+            return False
+        return chessboard.board[target[0]][target[1]].color != self.color
+
+    def attackedSquares(self, chessboard: Chessboard) -> tuple:
+        return KING_TARGETS[self.pos[0] * 8 + self.pos[1]]
 
 class Pawn(Chesspiece):
+    __slots__ = ('hasMoved',)
+    letter = 'P' # for notation
+    symbols = {'white': '♟', 'black': '♙'}
+
     def __init__(self, color) -> None:
         super().__init__()
         self.color = color
         self.hasMoved = False
-        
-        if color == 'white':
-            self.strRep = '♟'
-        else:
-            self.strRep = '♙'
 
     def canMoveTo(self, move: str, chessboard: Chessboard):
         # move == the position the piece is supposed to move to
         # board == the board all the pieces are on
-        possibleMoves = []
-        row, col = self.pos
+        target = chessboard.toIndexes(move)
+        square = self.pos[0] * 8 + self.pos[1]
+
+        # upward diagonals need an enemy to capture
+        if target in PAWN_CAPTURES[self.color][square]:
+            piece = chessboard.board[target[0]][target[1]]
+            return piece is not EMPTY and self.color != piece.color
+
+        # one space forward, or two if this pawn hasn't moved,
+        # can't move through pieces
+        for i, (row, col) in enumerate(PAWN_PUSHES[self.color][square]):
+            if chessboard.board[row][col] is not EMPTY:
+                return False
+            if (row, col) == target:
+                return i == 0 or not self.hasMoved
+
+        return False
 
-        # deals with the directly up cases being different
-        if (self.color == 'white' and not chessboard.isReversed or 
-            self.color == 'black' and chessboard.isReversed):
-            up = row - 1
-            twoUp = row - 2
-
-        elif (self.color == 'black' and not chessboard.isReversed or
-              self.color == 'white' and chessboard.isReversed):
-            up = row + 1
-            twoUp = row + 2
-        
-        # directly one space forward
-        if chessboard.isOnBoard(up, col):
-            directUp = chessboard.board[up][col]
-            if directUp == '~' and self.color != directUp.color:
-                possibleMoves.append(chessboard.positions[up][col])
-            
-        # upward diagonals
-        # error check for diagonals that are off the board
-        diags = [col - 1, col + 1]
-        diags = [diag for diag in diags if chessboard.isOnBoard(up, diag)]
-        
-        for diag in diags:
-            piece = chessboard.board[up][diag]
-            if piece != '~' and self.color != piece.color:
-                possibleMoves.append(chessboard.positions[up][diag])
-
-        # two spaces forward
-        if not self.hasMoved:
-            piece = chessboard.board[twoUp][col]
-            if directUp == '~':                     # can't move through pieces
-                if piece == '~' and self.color != piece.color:
-                    possibleMoves.append(chessboard.positions[twoUp][col])
-
-        return True if move in possibleMoves else False
\ No newline at end of file
+    def attackedSquares(self, chessboard: Chessboard) -> tuple:
+        return PAWN_CAPTURE_TARGETS[self.color][self.pos[0] * 8 + self.pos[1]]
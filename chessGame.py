@@ -1,33 +1,108 @@
-from re import search
-from chessBoard import Chessboard, Chesspiece, Pawn, King, Queen, Bishop, Knight, Rook
+import argparse
+import os
+from collections import Counter
+from chessBoard import Chessboard, Chesspiece, Move, EMPTY, Pawn, King, Rook
+from engine import Engine
+from parallel import ParallelEngine
+from moveGen import generateLegalMoves, moveToUci
+from notation import textToMove
+from book import OpeningBook, polyglotKey
+from boardIO import boardFromFen, boardToFen, fenClocks
+from tablebase import Tablebase
+from gameJournal import GameJournal
+
+FIFTY_MOVES = 100 # halfmoves without a capture or pawn move before it's a draw
+REPETITIONS = 3
 
 class Chessgame:
-    def __init__(self, boardObj: Chessboard) -> None:
+    def __init__(self, boardObj: Chessboard, computer=(), engine: Engine = None,
+                 book: OpeningBook = None, journal: GameJournal = None, halfmoves: int = 0) -> None:
         self.boardObj = boardObj
-        self.turn = 'white'
-        self.move = 0 # per one piece moved / captured
+        self.move = 0 # plies played, passes included
+        self.computer = set(computer) # colors the engine plays
+        self.engine = engine # made when the computer first has to move if None
+        self.book = book # the engine plays from here while the game is in book
+        self.journal = journal # every move gets written here too
+        self.clearHistory(halfmoves)
+
+    @classmethod
+    def fromFen(cls, fen: str, boardType=Chessboard, **options) -> 'Chessgame':
+        """A game carrying on from fen, its clocks included, raises ValueError
+        if it isn't a FEN"""
+        halfmoves, fullmoves = fenClocks(fen)
+        game = cls(boardFromFen(fen, boardType), halfmoves=halfmoves, **options)
+        game.move = (fullmoves - 1) * 2 + (game.turn == 'black')
+        return game
+
+    def toFen(self) -> str:
+        """The position as a FEN with the game's fifty move clock and move
+        number in it"""
+        return boardToFen(self.boardObj, self.halfmoves, self.move // 2 + 1)
+
+    @classmethod
+    def resume(cls, path: str, ply: int = None, **options) -> 'Chessgame':
+        """The game in the journal at path as of ply (default the end), off
+        the nearest snapshot. At the end it carries on recording to the
+        journal, earlier on it's only for looking at. Repetitions only count
+        from the snapshot on"""
+        journal = GameJournal(path)
+        ply = journal.plies if ply is None else ply
+        snapshotPly, chessboard, halfmoves = journal.snapshotBefore(ply)
+        game = cls(chessboard, halfmoves=halfmoves, **options)
+        game.move = snapshotPly
+        for move in journal.movesBetween(snapshotPly, ply):
+            if move is None:
+                game.passTurn()
+            else:
+                game.makeMove(move)
+        if ply == journal.plies:
+            game.journal = journal
+        else:
+            journal.close()
+        return game
+
+    @property
+    def turn(self) -> str:
+        """whose turn it is, kept on the board so makeMove() agrees with us"""
+        return self.boardObj.turn
+
+    @turn.setter
+    def turn(self, color: str):
+        self.boardObj.turn = color
 
     def gameLoop(self):
         """main method for the game"""
         while True:
             # check for check / checkmate
-            check, mate = self.inCheck()
-            if check and mate:
+            check, stuck = self.inCheck()
+            if check and stuck:
                 self.switchTurns(False)
                 self.boardObj.printBoard()
                 print(f'{self.turn} won! After {self.move} individual moves!')
                 break
-            elif check:
+            elif stuck:
+                self.boardObj.printBoard()
+                print(f'Stalemate, {self.turn} has no moves! Draw after {self.move} individual moves')
+                break
+            draw = self.drawReason()
+            if draw:
+                self.boardObj.printBoard()
+                print(f'Draw by {draw} after {self.move} individual moves')
+                break
+            if check:
                 print('You can only capture the checking piece or move', end='')
                 print(' your king.\n')
 
             self.boardObj.printBoard()
+            if self.turn in self.computer:
+                self.computerMove()
+                continue
             play = input(f'{self.turn.title()} what move would you like to play?\n>').strip()
             if play == '':
                 print("That's definitely not a valid move!")
                 continue
             elif play == 'pass':
-                self.switchTurns(False)
+                self.passTurn()
                 continue
             elif play == 'reset':
                 self.reset()
@@ -37,126 +112,134 @@ class Chessgame:
             elif play == 'reverse':
                 self.boardObj.reverseBoard()
                 continue
-            elif play == 'O-O' or play == 'O-O-O':
-                if len(play) == 3:
-                    self.castles()
-                else:
-                    self.qCastles()
-                self.switchTurns()
+            elif play == 'computer': # let the engine take over this side
+                self.computer.add(self.turn)
                 continue
 
-            # handle normal chess move
-            movePiece = self.getPieceToMove(move=play, color=self.turn)
-            if movePiece:
-                play = play[-2:] # remove the piece from the move
-
-                # remove before move because you change the pos tuple in move
-                self.removePiece(movePiece.pos[0], movePiece.pos[1])
-                self.movePiece(movePiece, move=play)
-            
-            self.switchTurns()
+            # handle normal chess move, castling included
+            try:
+                self.playMove(play)
+            except ValueError as error:
+                print(f"Can't play {play}, {error}!")
+                continue
+            print('\n------------------------------\n')
 
     def getPieceToMove(self, move: str, color: str):
-        """this method handles converting which piece to move and corresponding\n
-        it to a piece on the actual Chessboard, if there is nothing found, this\n
-        method will return None, else it will return the piece to move"""
-        firstChar = move[0]
-        if search('[a-h]', firstChar):
-            # sometimes you have to specify the file but the position is 
-            # guaranteed to be the last two indices of the move string
-            rawMove = move
-            move = move[-2:]
-            
-            # find all the pawns on the board
-            pawns = self.boardObj.searchBoard(Pawn)
-            # limit your pawns to only your color
-            pawns = [pawn for pawn in pawns if pawn.color == color]
-            
-            for pawn in pawns:
-                if 'x' in rawMove:
-                    correctFile = rawMove[0]
-                    thisFile = self.boardObj.files[pawn.pos[1]]
-                    if pawn.canMoveTo(move, self.boardObj) and correctFile == thisFile:
-                        return pawn
-                else:
-                    # this returns the first pawn that can move to that position
-                    if pawn.canMoveTo(move, self.boardObj):
-                        return pawn
-        
-        elif firstChar == 'K': # king
-            # if the King is capturing don't do anything different
-            # it's just unnecessary to know in chess notation because
-            # it's reflected on the board
-            move = move.replace('x', '')
-            king = self.boardObj.getKing(color)
-            if king.canMoveTo(move[1:], self.boardObj):
-                return king
+        """Works out which of color's pieces the move means, in SAN (e4, exd5,
+        Nbd7), long algebraic (Ng1-f3) or uci (e2e4). Returns None if no piece
+        fits or more than one does"""
+        if color != self.turn:
+            return None
+        try:
+            found = textToMove(self.boardObj, move)
+        except ValueError:
+            return None
+        return self.boardObj.board[found.start >> 3][found.start & 7]
 
-        elif firstChar == 'Q': # queen
-            move = move.replace('x', '')
-            queens = self.boardObj.searchBoard(Queen)
-            queen = [queen for queen in queens if queen.color == color]
-            if queen:                       # if there is a queen
-                queen = queen[0]            # get your queen
-                if queen.canMoveTo(move[1:], self.boardObj):
-                    return queen
+    def playMove(self, move: str) -> Move:
+        """Plays move (SAN, long algebraic or uci) for whoever's turn it is
+        without printing anything, raises ValueError if it isn't legal"""
+        found = textToMove(self.boardObj, move)
+        self.makeMove(found)
+        return found
 
-        elif firstChar == 'B': # bishop
-            move = move.replace('x', '')
-            bishops = self.boardObj.searchBoard(Bishop)
-            bishops = [bishop for bishop in bishops if bishop.color == color]
-            for bishop in bishops:
-                if bishop.canMoveTo(move[1:], self.boardObj):
-                    return bishop
-             
-        elif firstChar == 'N': # knight
-            knights = self.boardObj.searchBoard(Knight)
-            knights = [knight for knight in knights if knight.color == color]
-            if len(move) == 5:
-                # make sure it's the right file Knight
-                correctFile = move[1]
-                for knight in knights:
-                    thisFile = self.boardObj.files[knight.pos[1]]
-                    if knight.canMoveTo(move[-2:], self.boardObj) and correctFile == thisFile:
-                        return knight
-            else:
-                move = move.replace('x', '')
-                for knight in knights:
-                    if knight.canMoveTo(move[1:], self.boardObj):
-                        return knight
+    def makeMove(self, move: Move):
+        """Plays a legal move on the board and keeps the move count, draw
+        history and journal up to date"""
+        irreversible = self.isIrreversible(move)
+        self.boardObj.makeMove(move) # makeMove hands the turn over itself
+        self.move += 1
+        self.recordPosition(irreversible)
+        if self.journal is not None:
+            self.journal.append(move, self.boardObj, self.halfmoves)
+
+    def passTurn(self):
+        """Hands the turn over without a move, the journal keeps it too. The
+        side to move is part of the hash so the position counts as a new one,
+        the fifty move clock stays where it was since nothing moved"""
+        self.switchTurns(False)
+        self.move += 1 # a ply in the journal too, so the move number keeps up
+        self.recordPosition(False, moved=False)
+        if self.journal is not None:
+            self.journal.append(None, self.boardObj, self.halfmoves)
+
+    def clearHistory(self, halfmoves: int = 0):
+        """Starts the repetition count over from the current position and the
+        fifty move clock from halfmoves"""
+        self.seen = Counter()    # polyglotKey -> times it's been on the board since then
+        self.recordPosition(True)
+        self.halfmoves = halfmoves # since the last capture or pawn move
 
-        elif firstChar == 'R': # rook
-            move = move.replace('x', '')
-            rooks = self.boardObj.searchBoard(Rook)
-            rooks = [rook for rook in rooks if rook.color == color]
-            for rook in rooks:
-                if rook.canMoveTo(move[1:], self.boardObj):
-                    return rook
+    def isIrreversible(self, move: Move) -> bool:
+        """A capture or pawn move, nothing from before it can come back"""
+        board = self.boardObj.board
+        return (type(board[move.start >> 3][move.start & 7]) is Pawn or
+                board[move.end >> 3][move.end & 7] is not EMPTY)
+
+    def recordPosition(self, irreversible: bool, moved: bool = True):
+        """Counts the position now on the board, call after every move.
+        Positions from before an irreversible move can't come back, so they
+        are dropped and the counter only ever holds the current stretch.
+        Positions are told apart by polyglotKey so an en passant square
+        nobody can take on doesn't make a repeat look like a new position"""
+        if irreversible:
+            self.halfmoves = 0
+            self.seen.clear()
+        elif moved:
+            self.halfmoves += 1
+        self.seen[polyglotKey(self.boardObj)] += 1
+
+    def drawReason(self):
+        """'threefold repetition' or 'fifty move rule' if the game is drawn,
+        None if it isn't"""
+        if self.seen[polyglotKey(self.boardObj)] >= REPETITIONS:
+            return 'threefold repetition'
+        if self.halfmoves >= FIFTY_MOVES:
+            return 'fifty move rule'
+        return None
 
     def movePiece(self, piece: Chesspiece, move: str):
         """This moves the inputed piece to the chess notation move\nDoesn't
         account for removing the piece, call removePiece()"""
         indexes = self.moveToIndexes(move)
-        if isinstance(piece, Pawn) or isinstance(piece, Rook):
+        if isinstance(piece, (Pawn, Rook, King)):
             piece.hasMoved = True
-        piece.pos = (indexes[0], indexes[1])
-        self.boardObj.board[indexes[0]][indexes[1]] = piece
+        # a pawn that just moved two can be taken en passant on the square it skipped
+        self.boardObj.enPassant = None
+        if isinstance(piece, Pawn) and abs(indexes[0] - piece.pos[0]) == 2:
+            self.boardObj.enPassant = ((indexes[0] + piece.pos[0]) // 2, indexes[1])
+        self.boardObj.setPiece(piece, indexes[0], indexes[1])
+        self.boardObj.updateCastling()
+
+    def computerMove(self):
+        """The engine picks and plays a move for whoever's turn it is"""
+        move = self.book.weightedMove(self.boardObj) if self.book is not None else None
+        if move is not None:
+            print(f'{self.turn.title()} plays {moveToUci(self.boardObj, move)} (book)')
+        else:
+            if self.engine is None:
+                self.engine = Engine()
+            result = self.engine.search(self.boardObj)
+            if result.move is None:
+                return
+            move = result.move
+            print(f'{self.turn.title()} plays {moveToUci(self.boardObj, move)}', end='')
+            print(f' (depth {result.depth}, {result.nodes} nodes)')
+        self.makeMove(move)
+        print('\n------------------------------\n')
 
     def moveToIndexes(self, move: str) -> tuple:
         """This converts the chess notation to row, col format"""
-        positions = self.boardObj.positions
-        for i in range(len(positions)):
-            for j in range(len(positions[i])):
-                if positions[i][j] == move:
-                    return (i, j)
-        return ()
+        return self.boardObj.toIndexes(move)
     
     def removePiece(self, row: int, col: int):
         """remove a piece on the board at row, col\nVoid method"""
-        self.boardObj.board[row][col] = Chesspiece(row, col)
+        self.boardObj.clearSquare(row, col)
     
     def switchTurns(self, countMove=True):
         """switches the turns, increments move, creates readable output of board"""
+        # a pawn that moved two can only be taken straight after, not after a pass
+        self.boardObj.enPassant = None
         self.turn = 'white' if self.turn != 'white' else 'black'
         if countMove:
             self.move += 1 # one move has passed
@@ -164,9 +247,13 @@ class Chessgame:
     
     def reset(self):
         """Resets the board and puts the turn back to white"""
-        self.boardObj = Chessboard()
+        self.boardObj = type(self.boardObj)() # keep the same backend
         self.turn = 'white'
         self.move = 0
+        self.clearHistory()
+        if self.journal is not None: # a journal is one game
+            self.journal.close()
+            self.journal = None
 
     def castles(self):
         """O-O in chess notation, this moves the king and the rook"""
@@ -189,10 +276,8 @@ class Chessgame:
     def getKingAndRook(self, distance):
         """Used for castling"""
         color = self.turn
-        kings = self.boardObj.searchBoard(King)
-        king = [king for king in kings if king.color == color][0]
-        rooks = self.boardObj.searchBoard(Rook)
-        rooks = [rook for rook in rooks if rook.color == color]
+        king = self.boardObj.getKing(color)
+        rooks = self.boardObj.getPieces(Rook, color)
         rook = None
         for piece in rooks:
             if self.boardObj.distanceKingToRook(color, piece) == distance:
@@ -203,7 +288,7 @@ class Chessgame:
         """Used for castling"""
         between = self.boardObj.piecesBetweenRookKing(king, rook)
         for piece in between:
-            if piece != '~':
+            if piece is not EMPTY:
                 return False
         return True
 
@@ -214,68 +299,37 @@ class Chessgame:
         self.removePiece(row, col)
         self.removePiece(rRow, rCol)
         positions = self.boardObj.positions
-        
-        
-        if self.boardObj.isReversed:
-            self.movePiece(king, positions[row][col + kingOffset])
-            self.movePiece(rook, positions[rRow][rCol - rookOffset])
-        else:
-            self.movePiece(king, positions[row][col - kingOffset])
-            self.movePiece(rook, positions[rRow][rCol + rookOffset])
+        self.movePiece(king, positions[row][col - kingOffset])
+        self.movePiece(rook, positions[rRow][rCol + rookOffset])
 
     def inCheck(self) -> tuple:
-        """True if in check"""
-        color = self.turn
-        enemyColor = 'white' if color == 'black' else 'black'
-        king = self.boardObj.getKing(color)
-        kingSquare = self.boardObj.positions[king.pos[0]][king.pos[1]]
-        
-        # check for pieces that can move to king square
-        diagonals = king.checkDiagonals(self.boardObj)
-        horizontals = king.checkFileHor(self.boardObj)
-        verticals = king.checkFileVer(self.boardObj)
-        knights = king.checkKnightMoves(self.boardObj)
-        enemies = self.checkEnemies(diagonals, color, enemyColor)
-        enemies += self.checkEnemies(horizontals, color, enemyColor)
-        enemies += self.checkEnemies(verticals, color, enemyColor)
-        enemies += self.checkEnemies([knights], color, enemyColor)
-
-        # see if enemies can move to kingSquare
-        # therefore in check
-        for enemy in enemies:
-            if enemy.canMoveTo(kingSquare, self.boardObj):
-                
-                enemySquare = self.boardObj.positions[enemy.pos[0]][enemy.pos[1]]
-                possible = king.getPossibleMoves(self.boardObj)
-                spaces = 0
-                # check to see if the enemy piece can move to all the kin g's moves
-                # and not just the enemy square
-                for move in possible:
-                    if enemy.canMoveTo(move, self.boardObj):
-                        spaces += 1
-                    elif move == enemySquare:
-                        spaces += 1
-                
-                if spaces == len(possible):
-                    return True, True
-                else:
-                    return True, False
-
-        return False, False
-    
-
-    def checkEnemies(self, master: list, color, enemyColor):
-        enemies = []
-        for pieces in master:
-            for piece in pieces:
-                if piece.color == color:
-                    break
-                elif piece.color == enemyColor:
-                    enemies.append(piece)
-                    break
+        """(in check, no legal moves) for whoever's turn it is, both is mate and
+        only the second is stalemate. Check is a lookup in the board's attack
+        counts, the legal moves are every way out there is"""
+        check = self.boardObj.kingInCheck(self.turn)
+        return check, not generateLegalMoves(self.boardObj, self.turn)
 
-        return enemies
-        
 if __name__ == "__main__":     
-    game = Chessgame(Chessboard())
+    parser = argparse.ArgumentParser(description='play chess in the terminal')
+    parser.add_argument('--computer', nargs='*', default=[], choices=['white', 'black'],
+                        help='sides the engine plays')
+    parser.add_argument('--movetime', type=float, default=2.0, help='engine seconds per move')
+    parser.add_argument('--workers', type=int, default=1, help='processes the engine searches with')
+    parser.add_argument('--book', help='Polyglot .bin opening book for the engine')
+    parser.add_argument('--tablebase', help='file from tablebase.py build, for endings')
+    parser.add_argument('--journal', help='file to record the game to, carries on the game in it if there is one')
+    args = parser.parse_args()
+    book = OpeningBook(args.book) if args.book else None
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    if args.workers > 1:
+        engine = ParallelEngine(args.workers, moveTime=args.movetime, tablebase=tablebase)
+    else:
+        engine = Engine(moveTime=args.movetime, tablebase=tablebase)
+    options = {'computer': args.computer, 'engine': engine, 'book': book}
+    if args.journal and os.path.exists(args.journal):
+        game = Chessgame.resume(args.journal, **options)
+    else:
+        chessboard = Chessboard()
+        journal = GameJournal(args.journal, chessboard) if args.journal else None
+        game = Chessgame(chessboard, journal=journal, **options)
     game.gameLoop()
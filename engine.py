@@ -0,0 +1,296 @@
+"""Alpha-beta search for picking a move on a Chessboard.
+
+Iterative deepening with a transposition table keyed on the board's Zobrist
+hash, MVV-LVA ordering for captures, killer and history ordering for quiet
+moves and a captures only quiescence search at the leaves. Every search has
+a hard wall clock budget, when it runs out the best move from the last
+finished depth is played.
+
+ex. python engine.py bench --depth 4"""
+import argparse
+import time
+from typing import NamedTuple
+from chessBoard import Chessboard, Move, EMPTY, EN_PASSANT
+from moveGen import generateLegalMoves, inCheck, moveFromUci, moveToUci
+from pieceSquare import PIECE_VALUES
+from evaluate import evaluate
+MATE = 100000
+INFINITY = MATE + 1
+MATE_BOUND = MATE - 1000 # scores past this are mates, their distance is counted in plies
+
+# transposition table entry flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# positions used for tracking speed release over release, as moves from the start
+BENCH_POSITIONS = [
+    [],
+    ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1b5', 'a7a6'],
+    ['d2d4', 'g8f6', 'c2c4', 'e7e6', 'b1c3', 'f8b4', 'e2e3', 'e8g8'],
+    ['e2e4', 'c7c5', 'g1f3', 'd7d6', 'd2d4', 'c5d4', 'f3d4', 'g8f6', 'b1c3', 'a7a6'],
+    ['e2e4', 'e7e5', 'd1h5', 'b8c6', 'f1c4', 'g8f6'],
+]
+
+class SearchTimeout(Exception):
+    pass
+
+class SearchResult(NamedTuple):
+    move: Move
+    score: int       # centipawns for the side to move
+    depth: int       # last depth that finished
+    nodes: int
+    elapsed: float
+    depthTimes: list # seconds taken to finish each depth
+
+def material(chessboard: Chessboard) -> int:
+    """Material balance for the side to move"""
+    score = 0
+    for (kind, color), located in chessboard.pieceIndex.items():
+        value = PIECE_VALUES[kind.letter] * len(located)
+        score += value if color == chessboard.turn else -value
+    return score
+
+def toTable(score: int, ply: int) -> int:
+    """Mate scores count plies from the root, the table keeps them counted
+    from the position itself so they still hold when it's reached at
+    another ply"""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def fromTable(score: int, ply: int) -> int:
+    """Undoes toTable for a position reached ply plies from the root"""
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+class Engine:
+    def __init__(self, moveTime: float = 2.0, maxDepth: int = 64, evaluate=evaluate,
+                 tableSize: int = 1 << 20, tablebase=None) -> None:
+        self.moveTime = moveTime   # seconds per move
+        self.maxDepth = maxDepth
+        self.evaluate = evaluate   # score for the side to move
+        self.tableSize = tableSize # most positions kept in the transposition table
+        self.tablebase = tablebase # exact scores for the endings it has tables for
+        self.table = {}
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(128)] # two quiet moves per ply
+        self.history = {}                                # (start, end) -> cutoff score
+        self.keepHistory = False # carry killers and history over to the next search
+
+    def search(self, chessboard: Chessboard, moveTime: float = None, maxDepth: int = None,
+               alpha: int = -INFINITY, beta: int = INFINITY) -> SearchResult:
+        """Finds the best move for the side to move, the board is left as it was.
+        A narrower alpha, beta window only tells whether the score falls inside it"""
+        moveTime = self.moveTime if moveTime is None else moveTime
+        maxDepth = self.maxDepth if maxDepth is None else maxDepth
+        start = time.perf_counter()
+        self.deadline = start + moveTime
+        self.nodes = 0
+        if not self.keepHistory:
+            self.killers = [[None, None] for _ in range(128)]
+            self.history = {}
+        if len(self.table) > self.tableSize:
+            self.table.clear()
+
+        rootMoves = generateLegalMoves(chessboard, chessboard.turn)
+        if not rootMoves:
+            return SearchResult(None, -MATE if inCheck(chessboard, chessboard.turn) else 0,
+                                0, 0, 0.0, [])
+        bestMove, bestScore, finished = rootMoves[0], 0, 0
+        depthTimes = []
+        rootPly = len(chessboard.history)
+
+        for depth in range(1, maxDepth + 1):
+            try:
+                score, move = self.searchRoot(chessboard, rootMoves, depth, bestMove, alpha, beta)
+            except SearchTimeout:
+                # unwind whatever the search was in the middle of
+                while len(chessboard.history) > rootPly:
+                    chessboard.unmakeMove()
+                break
+            bestMove, bestScore, finished = move, score, depth
+            depthTimes.append(time.perf_counter() - start)
+            if abs(score) >= MATE - depth: # found a forced mate, deeper won't help
+                break
+
+        return SearchResult(bestMove, bestScore, finished, self.nodes,
+                            time.perf_counter() - start, depthTimes)
+
+    def searchRoot(self, chessboard: Chessboard, moves: list, depth: int, previousBest: Move,
+                   alpha: int, beta: int) -> tuple:
+        originalAlpha = alpha
+        bestScore, bestMove = -INFINITY, None
+        for move in self.orderMoves(chessboard, moves, previousBest, 0):
+            chessboard.makeMove(move)
+            score = -self.alphaBeta(chessboard, depth - 1, -beta, -alpha, 1)
+            chessboard.unmakeMove()
+            if score > bestScore:
+                bestScore, bestMove = score, move
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+
+        if bestScore >= beta:
+            flag = LOWER
+        elif bestScore > originalAlpha:
+            flag = EXACT
+        else:
+            flag = UPPER
+        self.store(chessboard.hash, depth, bestScore, flag, bestMove, 0)
+        return bestScore, bestMove
+
+    def alphaBeta(self, chessboard: Chessboard, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.tick()
+        if self.tablebase is not None:
+            found = self.tablebase.probe(chessboard)
+            if found is not None:
+                if found.result == 'draw':
+                    return 0
+                mate = MATE - ply - found.plies
+                return mate if found.result == 'win' else -mate
+        entry = self.table.get(chessboard.hash)
+        tableMove = None
+        if entry is not None:
+            entryDepth, score, flag, tableMove = entry
+            score = fromTable(score, ply)
+            if entryDepth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        checked = inCheck(chessboard, chessboard.turn)
+        if depth <= 0 and not checked: # don't stop with the king hanging
+            return self.quiescence(chessboard, alpha, beta, ply)
+
+        moves = generateLegalMoves(chessboard, chessboard.turn)
+        if not moves:
+            return -MATE + ply if checked else 0
+
+        originalAlpha = alpha
+        bestMove = None
+        for move in self.orderMoves(chessboard, moves, tableMove, ply):
+            chessboard.makeMove(move)
+            score = -self.alphaBeta(chessboard, depth - 1, -beta, -alpha, ply + 1)
+            chessboard.unmakeMove()
+            if score > alpha:
+                alpha, bestMove = score, move
+                if alpha >= beta:
+                    if not self.isCapture(chessboard, move):
+                        self.rememberQuiet(move, depth, ply)
+                    break
+
+        if alpha >= beta:
+            flag = LOWER
+        elif alpha > originalAlpha:
+            flag = EXACT
+        else:
+            flag = UPPER
+        self.store(chessboard.hash, depth, alpha, flag, bestMove, ply)
+        return alpha
+
+    def quiescence(self, chessboard: Chessboard, alpha: int, beta: int, ply: int) -> int:
+        """Only keeps searching captures so the score isn't taken mid exchange"""
+        self.tick()
+        standPat = self.evaluate(chessboard)
+        if standPat >= beta:
+            return standPat
+        alpha = max(alpha, standPat)
+
+        captures = [
+            move for move in generateLegalMoves(chessboard, chessboard.turn)
+            if self.isCapture(chessboard, move)
+        ]
+        for move in sorted(captures, key=lambda m: -self.mvvLva(chessboard, m)):
+            chessboard.makeMove(move)
+            score = -self.quiescence(chessboard, -beta, -alpha, ply + 1)
+            chessboard.unmakeMove()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def tick(self):
+        """Counts a node and stops the search once the time is up, the clock
+        is read every node since a node costs far more than reading it"""
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Move, ply: int):
+        self.table[key] = (depth, toTable(score, ply), flag, move)
+
+    def isCapture(self, chessboard: Chessboard, move: Move) -> bool:
+        return (move.flag == EN_PASSANT or
+                chessboard.board[move.end >> 3][move.end & 7] is not EMPTY)
+
+    def mvvLva(self, chessboard: Chessboard, move: Move) -> int:
+        """most valuable victim, least valuable attacker"""
+        if move.flag == EN_PASSANT:
+            return PIECE_VALUES['P'] * 10 - PIECE_VALUES['P']
+        victim = chessboard.board[move.end >> 3][move.end & 7]
+        attacker = chessboard.board[move.start >> 3][move.start & 7]
+        return PIECE_VALUES[victim.letter] * 10 - PIECE_VALUES[attacker.letter]
+
+    def rememberQuiet(self, move: Move, depth: int, ply: int):
+        """quiet moves that caused a cutoff get tried early next time"""
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        key = (move.start, move.end)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def orderMoves(self, chessboard: Chessboard, moves: list, tableMove: Move, ply: int) -> list:
+        """table move, then captures by MVV-LVA, then killers, then history"""
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+
+        def priority(move):
+            if move == tableMove:
+                return 10000000
+            if self.isCapture(chessboard, move):
+                return 1000000 + self.mvvLva(chessboard, move)
+            if move.promotion:
+                return 900000
+            if move == killers[0]:
+                return 800000
+            if move == killers[1]:
+                return 700000
+            return self.history.get((move.start, move.end), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+def bench(depth: int, moveTime: float):
+    """Searches every BENCH_POSITIONS position to depth, reporting nodes/s and
+    how long each depth took"""
+    totalNodes, totalTime = 0, 0.0
+    for i, moves in enumerate(BENCH_POSITIONS):
+        chessboard = Chessboard()
+        for uci in moves:
+            chessboard.makeMove(moveFromUci(chessboard, uci))
+        result = Engine(moveTime=moveTime).search(chessboard, maxDepth=depth)
+        totalNodes += result.nodes
+        totalTime += result.elapsed
+        times = ' '.join(f'd{d + 1}={t:.2f}s' for d, t in enumerate(result.depthTimes))
+        print(f'position {i}: {moveToUci(chessboard, result.move)} score {result.score} '
+              f'depth {result.depth} nodes {result.nodes} {times}')
+    print(f'total: {totalNodes} nodes in {totalTime:.2f}s '
+          f'({totalNodes / max(totalTime, 1e-9):.0f} nodes/s)')
+
+def main():
+    parser = argparse.ArgumentParser(description='alpha-beta engine')
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--movetime', type=float, default=60.0, help='seconds per position')
+    args = parser.parse_args()
+    if args.command == 'bench':
+        bench(args.depth, args.movetime)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Static evaluation of a Chessboard in centipawns for the side to move.
+
+Material and piece-square scores come straight off the board (pieceScore,
+kept up to date by setPiece and clearSquare), mobility and king safety read
+the board's attack counts and pawn structure only looks at the pawns, so a
+call never walks the 64 squares.
+
+ex. python evaluate.py bench
+    python evaluate.py batch positions.fen"""
+import argparse
+import sys
+import time
+from attackTables import KING_TARGETS
+from chessBoard import Chessboard, Pawn, Knight, Bishop, Rook, Queen
+from boardIO import boardFromFen, START_FEN
+from pieceSquare import KING_SWAP
+from perft import POSITIONS
+
+MOBILITY = 2          # per attack on a square, attacks are counted per attacker
+DOUBLED_PAWN = -15    # per pawn behind another of the same color on its file
+ISOLATED_PAWN = -12   # no friendly pawns on either next file
+PASSED_PAWN = [0, 120, 80, 50, 30, 15, 10, 0] # by rows to go until promoting
+PAWN_SHIELD = 10      # own pawn right in front of or beside a castled king
+KING_ZONE_ATTACK = -8 # per enemy attack on the squares around the king
+# no queens and at most this much other material a side is an endgame for the kings
+ENDGAME_MATERIAL = 1300
+MATERIAL = {Knight: 320, Bishop: 330, Rook: 500}
+
+def isEndgame(chessboard: Chessboard) -> bool:
+    index = chessboard.pieceIndex
+    if index[(Queen, 'white')] or index[(Queen, 'black')]:
+        return False
+    for color in ('white', 'black'):
+        if sum(value * len(index[(kind, color)]) for kind, value in MATERIAL.items()) > ENDGAME_MATERIAL:
+            return False
+    return True
+
+def pawnStructure(chessboard: Chessboard, color: str) -> int:
+    """Doubled, isolated and passed pawns for color"""
+    enemy = 'black' if color == 'white' else 'white'
+    own = chessboard.pieceIndex[(Pawn, color)]
+    theirs = chessboard.pieceIndex[(Pawn, enemy)]
+    files = [0] * 10 # padded a file each side so col - 1 and col + 1 always exist
+    for row, col in own:
+        files[col + 1] += 1
+    # fewest rows to go (counted for color) of the enemy pawns on each file, a
+    # pawn is passed when none on its file or the next ones are further up
+    nearest = [8] * 10
+    for row, col in theirs:
+        togo = row if color == 'white' else 7 - row
+        nearest[col + 1] = min(nearest[col + 1], togo)
+
+    score = 0
+    for count in files:
+        if count > 1:
+            score += DOUBLED_PAWN * (count - 1)
+    for row, col in own:
+        if not files[col] and not files[col + 2]:
+            score += ISOLATED_PAWN
+        togo = row if color == 'white' else 7 - row
+        if min(nearest[col], nearest[col + 1], nearest[col + 2]) >= togo:
+            score += PASSED_PAWN[togo]
+    return score
+
+def kingSafety(chessboard: Chessboard, color: str) -> int:
+    """Pawns sheltering a king on its back two rows and enemy attacks on the
+    squares around it"""
+    enemy = 'black' if color == 'white' else 'white'
+    row, col = chessboard.getKing(color).pos
+    attacks = chessboard.attacks[enemy]
+    score = KING_ZONE_ATTACK * sum(attacks[square] for square in KING_TARGETS[row * 8 + col])
+
+    forward = -1 if color == 'white' else 1
+    if row in ((7, 6) if color == 'white' else (0, 1)):
+        pawns = chessboard.pieceIndex[(Pawn, color)]
+        for c in (col - 1, col, col + 1):
+            if (row + forward, c) in pawns or (row + 2 * forward, c) in pawns:
+                score += PAWN_SHIELD
+    return score
+
+def evaluate(chessboard: Chessboard) -> int:
+    """Score for the side to move, positive is good for them"""
+    score = chessboard.pieceScore
+    if isEndgame(chessboard):
+        for color in ('white', 'black'):
+            row, col = chessboard.getKing(color).pos
+            score += KING_SWAP[color][row * 8 + col]
+    else:
+        score += kingSafety(chessboard, 'white') - kingSafety(chessboard, 'black')
+    score += MOBILITY * (sum(chessboard.attacks['white']) - sum(chessboard.attacks['black']))
+    score += pawnStructure(chessboard, 'white') - pawnStructure(chessboard, 'black')
+    return score if chessboard.turn == 'white' else -score
+
+def evaluateBatch(fens, boardType=Chessboard) -> list:
+    """evaluate for every FEN in fens, None for any that isn't a FEN"""
+    scores = []
+    for fen in fens:
+        try:
+            scores.append(evaluate(boardFromFen(fen, boardType)))
+        except ValueError:
+            scores.append(None)
+    return scores
+
+def bench(seconds: float) -> float:
+    """Evaluations per second over the perft test positions, for about seconds"""
+    boards = [boardFromFen(fen) for fen in POSITIONS.values()]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for chessboard in boards:
+            for i in range(100):
+                evaluate(chessboard)
+        count += 100 * len(boards)
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='static evaluation')
+    commands = parser.add_subparsers(dest='command', required=True)
+    timing = commands.add_parser('bench', help='evaluations per second')
+    timing.add_argument('--seconds', type=float, default=2.0)
+    batch = commands.add_parser('batch', help='score a file of FENs, one a line')
+    batch.add_argument('file', nargs='?', default='-', help='- for stdin')
+    score = commands.add_parser('score', help='score one position')
+    score.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        print(f'{bench(args.seconds):.0f} evaluations/s')
+    elif args.command == 'score':
+        print(evaluate(boardFromFen(args.fen)))
+    else:
+        file = sys.stdin if args.file == '-' else open(args.file)
+        with file:
+            fens = [line.strip() for line in file if line.strip()]
+        for fen, value in zip(fens, evaluateBatch(fens)):
+            print(f'{"-" if value is None else value}\t{fen}')
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""An append only file of one game's moves, for picking a game back up after
+a crash and for jumping around in long stored games.
+
+The file is a 12 byte header and then records one after another, 3 bytes a
+move (or a pass) and every snapshotEvery plies a snapshot of the whole position (boardIO's
+packed 32 bytes and the fifty move clock). A board at any ply is the
+snapshot at or before it with the few moves after it played on top, so
+nothing ever replays from the start. Every record is flushed as soon as it
+is written, and a record cut off half way by a crash is dropped the next
+time the file is opened.
+
+ex. journal = GameJournal('game.journal', chessboard)
+    journal.append(move, chessboard)
+    GameJournal('game.journal').boardAt(40)
+    python gameJournal.py show game.journal --ply 40"""
+import argparse
+import bisect
+import os
+import struct
+from array import array
+from chessBoard import Chessboard, Move, QUIET
+from boardIO import packBoard, unpackBoard, boardToFen
+from moveGen import PROMOTIONS, moveToUci
+
+MAGIC = b'BCGJ'
+VERSION = 1
+HEADER = struct.Struct('<4sII')         # magic, version, plies between snapshots
+MOVE = struct.Struct('<cH')             # b'm', start | end << 6 | kind << 12
+SNAPSHOT = struct.Struct('<cIH32s')     # b's', ply, halfmoves, packed board
+RECORDS = {b'm': MOVE, b's': SNAPSHOT}
+SNAPSHOT_EVERY = 32
+PASS = 0xFFFF # move code for a pass, real moves never get this high
+
+def encodeMove(move: Move) -> int:
+    """16 bits, kind is the flag or 4 + the promotion's place in PROMOTIONS,
+    None is a pass"""
+    if move is None:
+        return PASS
+    kind = 4 + PROMOTIONS.index(move.promotion) if move.promotion else move.flag
+    return move.start | move.end << 6 | kind << 12
+
+def decodeMove(code: int) -> Move:
+    if code == PASS:
+        return None
+    kind = code >> 12
+    if kind >= 4:
+        return Move(code & 63, code >> 6 & 63, PROMOTIONS[kind - 4], QUIET)
+    return Move(code & 63, code >> 6 & 63, None, kind)
+
+def replayMove(chessboard: Chessboard, move: Move):
+    """Plays a recorded move, None hands the turn over like a pass does"""
+    if move is None:
+        chessboard.enPassant = None
+        chessboard.turn = 'black' if chessboard.turn == 'white' else 'white'
+    else:
+        chessboard.makeMove(move)
+
+class GameJournal:
+    """Opens path for appending, a new file starts with chessboard as ply 0"""
+
+    def __init__(self, path: str, chessboard: Chessboard = None,
+                 snapshotEvery: int = SNAPSHOT_EVERY) -> None:
+        self.path = path
+        self.moves = array('H') # every move's code, ply n's move is moves[n - 1]
+        self.snapshots = []     # (ply, file offset) in ply order
+        if not os.path.exists(path) or not os.path.getsize(path):
+            if chessboard is None:
+                raise ValueError(f'{path} is a new journal, it needs a starting board')
+            self.file = open(path, 'wb')
+            self.snapshotEvery = snapshotEvery
+            self.file.write(HEADER.pack(MAGIC, VERSION, snapshotEvery))
+            self.writeSnapshot(chessboard, 0)
+            return
+        self.file = open(path, 'r+b')
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def plies(self) -> int:
+        return len(self.moves)
+
+    def load(self):
+        """Reads the record index back, dropping anything past the last whole
+        record so appending carries on from there"""
+        data = self.file.read()
+        magic, version, self.snapshotEvery = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a game journal')
+        offset = HEADER.size
+        while offset < len(data):
+            record = RECORDS.get(data[offset:offset + 1])
+            if record is None or offset + record.size > len(data):
+                break
+            if record is MOVE:
+                self.moves.append(MOVE.unpack_from(data, offset)[1])
+            else:
+                self.snapshots.append((SNAPSHOT.unpack_from(data, offset)[1], offset))
+            offset += record.size
+        if not self.snapshots:
+            self.close()
+            raise ValueError(f'{self.path} has no starting position')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def writeSnapshot(self, chessboard: Chessboard, halfmoves: int):
+        self.snapshots.append((self.plies, self.file.tell()))
+        self.file.write(SNAPSHOT.pack(b's', self.plies, min(halfmoves, 0xFFFF), packBoard(chessboard)))
+        self.file.flush()
+
+    def append(self, move: Move, chessboard: Chessboard, halfmoves: int = 0):
+        """Records move, call after it's been played on chessboard, None for
+        a pass. halfmoves is the fifty move clock after it, kept in the
+        snapshots"""
+        code = encodeMove(move)
+        self.moves.append(code)
+        self.file.write(MOVE.pack(b'm', code))
+        if self.plies % self.snapshotEvery == 0:
+            self.writeSnapshot(chessboard, halfmoves)
+        else:
+            self.file.flush()
+
+    def snapshotBefore(self, ply: int, boardType=Chessboard) -> tuple:
+        """(snapshot ply, board, halfmoves) of the last snapshot at or before ply"""
+        if not 0 <= ply <= self.plies:
+            raise ValueError(f'ply {ply} is not in the game, it has {self.plies}')
+        snapshotPly, offset = self.snapshots[bisect.bisect_right(self.snapshots, (ply, float('inf'))) - 1]
+        self.file.flush()
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            tag, snapshotPly, halfmoves, packed = SNAPSHOT.unpack(file.read(SNAPSHOT.size))
+        return snapshotPly, unpackBoard(packed, boardType), halfmoves
+
+    def movesBetween(self, start: int, end: int) -> list:
+        """Moves taking the game from ply start to ply end, None for a pass"""
+        return [decodeMove(code) for code in self.moves[start:end]]
+
+    def boardAt(self, ply: int, boardType=Chessboard) -> Chessboard:
+        """The position after ply moves"""
+        snapshotPly, chessboard, halfmoves = self.snapshotBefore(ply, boardType)
+        for move in self.movesBetween(snapshotPly, ply):
+            replayMove(chessboard, move)
+        return chessboard
+
+def main():
+    parser = argparse.ArgumentParser(description='look inside a game journal')
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help='the position at a ply')
+    show.add_argument('journal')
+    show.add_argument('--ply', type=int, help='defaults to the last one')
+    moves = commands.add_parser('moves', help='every move in uci, 0000 for a pass')
+    moves.add_argument('journal')
+    args = parser.parse_args()
+
+    with GameJournal(args.journal) as journal:
+        if args.command == 'show':
+            ply = journal.plies if args.ply is None else args.ply
+            chessboard = journal.boardAt(ply)
+            chessboard.printBoard()
+            print(f'ply {ply} of {journal.plies}: {boardToFen(chessboard)}')
+        else:
+            snapshotPly, chessboard, halfmoves = journal.snapshotBefore(0)
+            for move in journal.movesBetween(0, journal.plies):
+                print('0000' if move is None else moveToUci(chessboard, move))
+                replayMove(chessboard, move)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
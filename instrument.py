@@ -0,0 +1,180 @@
+"""Opt in call counts and timings for the hot paths, to see where the time
+goes in a game, a batch of PGN replays or a search.
+
+Nothing is wrapped until enable() is called, it swaps each function in
+TARGETS for a wrapper that counts calls and adds up the time spent inside,
+and disable() puts the originals back, so with it off the code runs exactly
+as it always does. Chessboard.makeMove also counts the memory blocks still
+allocated after each move (sys.getallocatedblocks), which shows moves that
+leave garbage behind. Times include whatever the function calls, and a
+function that calls itself counts the inner time again. Work done in other
+processes (ParallelEngine's workers) isn't seen.
+
+ex. with profiled():
+        replayFile('games.pgn')
+    print(report())
+    python instrument.py replay games.pgn --json stats.json
+    python instrument.py search --movetime 5
+    python instrument.py game --computer black"""
+import argparse
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+import moveGen
+import notation
+from chessBoard import Chessboard, Chesspiece, Pawn, Knight, Bishop, Rook, Queen, King
+from chessGame import Chessgame
+from engine import Engine
+from boardIO import boardFromFen, START_FEN
+from pgn import replayFile
+
+# (owner, attribute) of everything enable() wraps, owner is a class or module
+TARGETS = [(kind, 'canMoveTo') for kind in (Pawn, Knight, Bishop, Rook, Queen, King)] + [
+    (Chesspiece, 'checkKnightMoves'), (Chesspiece, 'checkDiagonals'),
+    (Chesspiece, 'checkFileHor'), (Chesspiece, 'checkFileVer'),
+    (Chesspiece, 'canSlideTo'), (Chesspiece, 'slideSquares'),
+    (Chessboard, 'slideRay'), (Chessboard, 'searchBoard'), (Chessboard, 'makeMove'),
+    (Chessboard, 'unmakeMove'), (Chessgame, 'inCheck'), (Chessgame, 'getPieceToMove'),
+    (moveGen, 'inCheck'), (moveGen, 'generateLegalMoves'), (notation, 'textToMove'),
+    (Engine, 'search'),
+]
+ALLOCATIONS = {'Chessboard.makeMove'} # also count the blocks left allocated per call
+
+stats = {}     # name -> [calls, seconds, blocks]
+installed = [] # (owner, attribute, original) to put back
+
+def targetName(owner, attribute: str) -> str:
+    return f'{owner.__name__}.{attribute}'
+
+def wrap(name: str, function):
+    entry = stats.setdefault(name, [0, 0.0, 0])
+    clock = time.perf_counter
+    if name in ALLOCATIONS:
+        blocks = sys.getallocatedblocks
+
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            before = blocks()
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                entry[1] += clock() - start
+                entry[0] += 1
+                entry[2] += blocks() - before
+        return counted
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            entry[1] += clock() - start
+            entry[0] += 1
+    return timed
+
+def enable():
+    """Wraps every target, calling it again does nothing"""
+    if installed:
+        return
+    for owner, attribute in TARGETS:
+        original = owner.__dict__[attribute]
+        wrapped = wrap(targetName(owner, attribute), original)
+        setattr(owner, attribute, wrapped)
+        installed.append((owner, attribute, original))
+        if isinstance(owner, type):
+            continue
+        # modules that did from owner import attribute have their own name for it
+        for module in list(sys.modules.values()):
+            if module is not owner and getattr(module, attribute, None) is original:
+                setattr(module, attribute, wrapped)
+                installed.append((module, attribute, original))
+
+def disable():
+    """Puts every original back"""
+    while installed:
+        owner, attribute, original = installed.pop()
+        setattr(owner, attribute, original)
+
+def reset():
+    for entry in stats.values():
+        entry[:] = [0, 0.0, 0]
+
+@contextmanager
+def profiled():
+    """Counts from zero for the with block, ex.
+        with profiled():
+            engine.search(chessboard)"""
+    reset()
+    enable()
+    try:
+        yield stats
+    finally:
+        disable()
+
+def snapshot() -> dict:
+    """name -> {calls, seconds, perCall, (blocksPerCall)} for everything
+    that was called"""
+    result = {}
+    for name, (calls, seconds, blocks) in stats.items():
+        if not calls:
+            continue
+        result[name] = {'calls': calls, 'seconds': seconds, 'perCall': seconds / calls}
+        if name in ALLOCATIONS:
+            result[name]['blocksPerCall'] = blocks / calls
+    return result
+
+def toJson() -> str:
+    return json.dumps(snapshot(), indent=2)
+
+def report() -> str:
+    """Text table of snapshot(), most time first"""
+    lines = [f'{"function":32} {"calls":>10} {"total ms":>10} {"us/call":>9}']
+    for name, entry in sorted(snapshot().items(), key=lambda item: -item[1]['seconds']):
+        line = f'{name:32} {entry["calls"]:>10} {entry["seconds"] * 1000:>10.1f} {entry["perCall"] * 1e6:>9.2f}'
+        if 'blocksPerCall' in entry:
+            line += f'  {entry["blocksPerCall"]:+.2f} blocks/call'
+        lines.append(line)
+    return '\n'.join(lines)
+
+def write(path: str):
+    """'-' prints the report, anything else is a JSON file to write"""
+    if path == '-':
+        print(report())
+        return
+    with open(path, 'w') as file:
+        file.write(toJson())
+
+def main():
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--json', default='-', help='file for the stats as JSON, - for a text report')
+    parser = argparse.ArgumentParser(description='hot path call counts and timings')
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay = commands.add_parser('replay', parents=[output], help='replay PGN files')
+    replay.add_argument('files', nargs='+')
+    search = commands.add_parser('search', parents=[output], help='one engine search')
+    search.add_argument('--fen', default=START_FEN)
+    search.add_argument('--movetime', type=float, default=2.0)
+    search.add_argument('--depth', type=int, default=64)
+    game = commands.add_parser('game', parents=[output], help='play a game in the terminal')
+    game.add_argument('--computer', nargs='*', default=[], choices=['white', 'black'])
+    game.add_argument('--movetime', type=float, default=2.0)
+    args = parser.parse_args()
+
+    with profiled():
+        if args.command == 'replay':
+            for path in args.files:
+                for game, error in replayFile(path):
+                    pass
+        elif args.command == 'search':
+            Engine(moveTime=args.movetime).search(boardFromFen(args.fen), maxDepth=args.depth)
+        else:
+            Chessgame(Chessboard(), args.computer, Engine(moveTime=args.movetime)).gameLoop()
+    write(args.json)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
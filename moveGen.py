@@ -0,0 +1,187 @@
+"""Full legal move generation for a Chessboard, including pins, castling,
+promotion and en passant.
+
+Squares are the same row * 8 + col index the attack tables use, so a move
+is a handful of small ints instead of notation strings."""
+from attackTables import (
+    KNIGHT_MOVES, KING_MOVES, RAYS, PAWN_PUSHES, PAWN_CAPTURES, STRAIGHT, DIAGONAL,
+    RAY_TARGETS, RAY_DIRECTIONS
+)
+from chessBoard import (
+    Chessboard, Move, EMPTY, Pawn, King, Queen, Bishop, Knight, Rook,
+    QUIET, DOUBLE_PUSH, EN_PASSANT, CASTLE, CASTLING, EN_PASSANT_ROWS
+)
+
+PROMOTIONS = (Queen, Rook, Bishop, Knight)
+
+def enemyOf(color: str) -> str:
+    return 'black' if color == 'white' else 'white'
+
+def squareName(chessboard: Chessboard, square: int) -> str:
+    return chessboard.positions[square >> 3][square & 7]
+
+def moveToUci(chessboard: Chessboard, move: Move) -> str:
+    """ex. e2e4 or e7e8q"""
+    uci = squareName(chessboard, move.start) + squareName(chessboard, move.end)
+    if move.promotion:
+        uci += move.promotion.letter.lower()
+    return uci
+
+def isAttacked(chessboard: Chessboard, row: int, col: int, byColor: str) -> bool:
+    """True if any byColor piece attacks row, col, read off the attack counts
+    the board keeps up to date"""
+    return chessboard.isAttacked(row, col, byColor)
+
+def inCheck(chessboard: Chessboard, color: str) -> bool:
+    return chessboard.kingInCheck(color)
+
+def pinnedSquares(chessboard: Chessboard, color: str) -> set:
+    """Squares of color's pieces that can't leave the line to their king"""
+    return chessboard.pinnedSquares(color)
+
+def generatePseudoMoves(chessboard: Chessboard, color: str) -> list:
+    """Every move color's pieces could make ignoring whether their own king is
+    left in check, castling is only generated when it is fully legal"""
+    board = chessboard.board
+    moves = []
+    append = moves.append
+
+    for (kind, pieceColor), located in chessboard.pieceIndex.items():
+        if pieceColor != color:
+            continue
+        for (row, col) in list(located):
+            square = row * 8 + col
+
+            if kind is Pawn:
+                lastRow = 0 if color == 'white' else 7
+                epRow = EN_PASSANT_ROWS[color]
+                for r, c in PAWN_CAPTURES[color][square]:
+                    target = board[r][c]
+                    if target is not EMPTY and target.color != color:
+                        if r == lastRow:
+                            for promotion in PROMOTIONS:
+                                append(Move(square, r * 8 + c, promotion))
+                        else:
+                            append(Move(square, r * 8 + c))
+                    elif r == epRow and (r, c) == chessboard.enPassant:
+                        append(Move(square, r * 8 + c, None, EN_PASSANT))
+                for i, (r, c) in enumerate(PAWN_PUSHES[color][square]):
+                    if board[r][c] is not EMPTY:
+                        break
+                    if r == lastRow:
+                        for promotion in PROMOTIONS:
+                            append(Move(square, r * 8 + c, promotion))
+                    else:
+                        append(Move(square, r * 8 + c, None, DOUBLE_PUSH if i else QUIET))
+
+            elif kind is Knight or kind is King:
+                table = KNIGHT_MOVES if kind is Knight else KING_MOVES
+                for r, c in table[square]:
+                    if board[r][c].color != color:
+                        append(Move(square, r * 8 + c))
+
+            else:
+                if kind is Rook:
+                    directions = STRAIGHT
+                elif kind is Bishop:
+                    directions = DIAGONAL
+                else:
+                    directions = STRAIGHT + DIAGONAL
+                rays = RAYS[square]
+                for direction in directions:
+                    for r, c in rays[direction]:
+                        target = board[r][c]
+                        if target.color == color:
+                            break
+                        append(Move(square, r * 8 + c))
+                        if target is not EMPTY:
+                            break
+
+    moves += generateCastles(chessboard, color)
+    return moves
+
+def generateCastles(chessboard: Chessboard, color: str) -> list:
+    enemy = enemyOf(color)
+    moves = []
+    for right in chessboard.castling:
+        if right.isupper() != (color == 'white'):
+            continue
+        kingFrom, kingTo, rookFrom, rookTo, between = CASTLING[right]
+        if any(chessboard.board[r][c] is not EMPTY for r, c in map(chessboard.toIndexes, between)):
+            continue
+        # the king can't castle out of, through or into check
+        crossed = (kingFrom, rookTo, kingTo)
+        if any(isAttacked(chessboard, r, c, enemy) for r, c in map(chessboard.toIndexes, crossed)):
+            continue
+        kRow, kCol = chessboard.toIndexes(kingFrom)
+        toRow, toCol = chessboard.toIndexes(kingTo)
+        moves.append(Move(kRow * 8 + kCol, toRow * 8 + toCol, None, CASTLE))
+    return moves
+
+def generateLegalMoves(chessboard: Chessboard, color: str) -> list:
+    """Every legal move for color. King moves are checked against the attack
+    counts, only moves that could expose the king (pinned pieces, en passant
+    or anything while in check) are tried on the board to make sure"""
+    if chessboard.generatesMoves:
+        return chessboard.legalMoves(color)
+    enemy = enemyOf(color)
+    king = chessboard.getKing(color)
+    kingSquare = king.pos[0] * 8 + king.pos[1]
+    attacks = chessboard.attacks[enemy]
+    checked = attacks[kingSquare] > 0
+    pinned = pinnedSquares(chessboard, color)
+
+    # the king blocks the ray of a slider checking it, so the square behind
+    # it doesn't show up as attacked yet
+    behind = set()
+    if checked:
+        for piece, rays, at in chessboard.sliders.values():
+            direction = RAY_DIRECTIONS[at].get(kingSquare)
+            if piece.color == enemy and direction in rays and kingSquare in rays[direction]:
+                behind.update(RAY_TARGETS[kingSquare][direction][:1])
+
+    legal = []
+    for move in generatePseudoMoves(chessboard, color):
+        if move.flag == CASTLE:
+            legal.append(move)
+            continue
+        if move.start == kingSquare:
+            if not attacks[move.end] and move.end not in behind:
+                legal.append(move)
+            continue
+        if not (checked or move.start in pinned or move.flag == EN_PASSANT):
+            legal.append(move)
+            continue
+        chessboard.makeMove(move)
+        if not inCheck(chessboard, color):
+            legal.append(move)
+        chessboard.unmakeMove()
+    return legal
+
+def isLegal(chessboard: Chessboard, move: Move) -> bool:
+    """Whether a move that follows the piece's rules leaves the mover's king
+    safe, castling's squares are checked by generateCastles instead. Like
+    generateLegalMoves only moves that could expose the king are tried on
+    the board"""
+    if chessboard.generatesMoves:
+        return chessboard.isLegalMove(move)
+    color = chessboard.turn
+    row, col = chessboard.getKing(color).pos
+    kingSquare = row * 8 + col
+    attacks = chessboard.attacks[enemyOf(color)]
+    if not attacks[kingSquare] and move.flag != EN_PASSANT:
+        if move.start == kingSquare:
+            return not attacks[move.end]
+        if move.start not in pinnedSquares(chessboard, color):
+            return True
+    chessboard.makeMove(move)
+    safe = not chessboard.kingInCheck(color)
+    chessboard.unmakeMove()
+    return safe
+
+def moveFromUci(chessboard: Chessboard, uci: str):
+    """The legal move for the side to move matching uci like e2e4, or None"""
+    for move in generateLegalMoves(chessboard, chessboard.turn):
+        if moveToUci(chessboard, move) == uci:
+            return move
+    return None
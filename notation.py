@@ -0,0 +1,137 @@
+"""Reading move text, SAN (Nbd7, exd8=Q+), long algebraic (Ng1-f3, e7xd8=Q)
+and UCI (e2e4, e7e8q), into a ParsedMove and from there into a Move.
+
+Squares in a ParsedMove are row * 8 + col like everywhere else, row 0 is
+rank 8. Parsing only looks at the text, so the same string always
+parses the same way and parsed strings are kept in an LRU cache, a PGN
+archive says Nf3 and O-O a lot more often than it says anything new.
+
+ex. textToMove(chessboard, 'Nbd7')
+    parseMove('e7e8q')"""
+import re
+from functools import lru_cache
+from typing import NamedTuple
+from chessBoard import (
+    Chessboard, Move, Pawn, King, Queen, Bishop, Knight, Rook, QUIET, DOUBLE_PUSH, EN_PASSANT, CASTLE,
+    EN_PASSANT_ROWS
+)
+from moveGen import generateLegalMoves, isLegal
+
+FILES = {name: col for col, name in enumerate('abcdefgh')}
+RANKS = {str(8 - row): row for row in range(8)}
+SQUARES = {file + rank: row * 8 + col for file, col in FILES.items() for rank, row in RANKS.items()}
+NAMES = sorted(SQUARES, key=SQUARES.get) # row * 8 + col -> name
+PIECES = {'P': Pawn, 'N': Knight, 'B': Bishop, 'R': Rook, 'Q': Queen, 'K': King}
+CASTLES = {'O-O': 'K', 'O-O-O': 'Q', '0-0': 'K', '0-0-0': 'Q'}
+# piece letter, from file, from rank, - or x, to square, promotion, annotations
+MOVE = re.compile(r'([NBRQK])?([a-h])?([1-8])?[-x]?([a-h][1-8])(?:=?([NBRQnbrq]))?[+#]?[!?]*')
+CACHE_SIZE = 4096
+
+class ParsedMove(NamedTuple):
+    piece: str          # letter of the piece that moves, None if the text didn't say (uci)
+    fromFile: int       # col the piece starts on or None
+    fromRank: int       # row the piece starts on or None
+    to: int             # row * 8 + col, None for castling
+    promotion: str = None
+    castle: str = None  # 'K' or 'Q' for O-O and O-O-O
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parseMove(text: str) -> ParsedMove:
+    """ParsedMove for text, raises ValueError if it isn't move notation"""
+    castle = CASTLES.get(text.rstrip('+#!?'))
+    if castle:
+        return ParsedMove('K', None, None, None, None, castle)
+    match = MOVE.fullmatch(text)
+    if not match:
+        raise ValueError(f'not a move: {text}')
+    letter, fromFile, fromRank, to, promotion = match.groups()
+    if letter is None and not (fromFile and fromRank):
+        letter = 'P' # SAN only leaves the letter off pawn moves
+    return ParsedMove(
+        letter, FILES.get(fromFile), RANKS.get(fromRank), SQUARES[to],
+        promotion.upper() if promotion else None
+    )
+
+def textToMove(chessboard: Chessboard, text: str) -> Move:
+    """The legal move text means for the side to move, raises ValueError if
+    there isn't exactly one"""
+    parsed = parseMove(text)
+    if parsed.castle:
+        return castleMove(chessboard, parsed.castle)
+    if parsed.fromFile is not None and parsed.fromRank is not None:
+        return coordinateMove(chessboard, parsed)
+
+    kind = PIECES[parsed.piece]
+    promotion = PIECES[parsed.promotion] if parsed.promotion else None
+    toRow, toCol = divmod(parsed.to, 8)
+    # only the pieces that can get to the square are looked at
+    found = []
+    for piece in chessboard.attackersTo(NAMES[parsed.to], chessboard.turn, kind):
+        row, col = piece.pos
+        if ((parsed.fromFile is not None and col != parsed.fromFile) or
+                (parsed.fromRank is not None and row != parsed.fromRank)):
+            continue
+        flag = QUIET
+        if kind is Pawn:
+            if parsed.fromFile is None and col != toCol:
+                continue # a pawn only goes sideways when the move says its file
+            if (toRow in (0, 7)) != (promotion is not None):
+                continue # has to promote on the last row and nowhere else
+            if abs(toRow - row) == 2:
+                flag = DOUBLE_PUSH
+            elif (toRow, toCol) == chessboard.enPassant and col != toCol:
+                if toRow != EN_PASSANT_ROWS[chessboard.turn]:
+                    continue # the last move wasn't the other side's double push
+                flag = EN_PASSANT
+        elif promotion is not None:
+            continue
+        move = Move(row * 8 + col, toRow * 8 + toCol, promotion, flag)
+        if isLegal(chessboard, move):
+            found.append(move)
+
+    if not found:
+        raise ValueError('illegal move')
+    if len(found) > 1:
+        raise ValueError('ambiguous move')
+    return found[0]
+
+def coordinateMove(chessboard: Chessboard, parsed: ParsedMove) -> Move:
+    """Move for text that gives both squares, long algebraic or uci"""
+    row, col = parsed.fromRank, parsed.fromFile
+    toRow, toCol = divmod(parsed.to, 8)
+    piece = chessboard.board[row][col]
+    target = chessboard.board[toRow][toCol]
+    if piece.color != chessboard.turn or parsed.piece not in (None, piece.letter):
+        raise ValueError('illegal move')
+    if type(piece) is King and (abs(toCol - col) == 2 or target.color == piece.color):
+        # e1g1, or the king taking its own rook like Polyglot and chess960 write it
+        return castleMove(chessboard, 'K' if toCol > col else 'Q')
+
+    promotion = PIECES[parsed.promotion] if parsed.promotion else None
+    flag = QUIET
+    if type(piece) is Pawn:
+        if (toRow in (0, 7)) != (promotion is not None):
+            raise ValueError('illegal move')
+        if abs(toRow - row) == 2:
+            flag = DOUBLE_PUSH
+        elif (toRow, toCol) == chessboard.enPassant and col != toCol:
+            if toRow != EN_PASSANT_ROWS[chessboard.turn]:
+                raise ValueError('illegal move')
+            flag = EN_PASSANT
+    elif promotion is not None:
+        raise ValueError('illegal move')
+    if all(other is not piece for other in chessboard.attackersTo(NAMES[parsed.to], chessboard.turn, type(piece))):
+        raise ValueError('illegal move')
+    move = Move(row * 8 + col, toRow * 8 + toCol, promotion, flag)
+    if not isLegal(chessboard, move):
+        raise ValueError('illegal move')
+    return move
+
+def castleMove(chessboard: Chessboard, side: str) -> Move:
+    """The castling move to side ('K' or 'Q') for the side to move"""
+    rank = '1' if chessboard.turn == 'white' else '8'
+    target = divmod(SQUARES[('g' if side == 'K' else 'c') + rank], 8)
+    for move in generateLegalMoves(chessboard, chessboard.turn):
+        if move.flag == CASTLE and (move.end >> 3, move.end & 7) == target:
+            return move
+    raise ValueError('castling is not legal here')
@@ -0,0 +1,164 @@
+"""Searches one position on several cores by splitting the root moves over a
+process pool, each worker keeps one Engine for its whole life so its
+transposition table and move ordering carry over from one root move to the
+next.
+
+The first iterations are searched in this process with a plain Engine on a
+slice of the time (SERIAL_SHARE), which is cheap and gives the best move and
+its score. Every deeper iteration is split until the time runs out or
+maxDepth is reached: the best move so far is searched on its own to get a
+score to beat, the rest only have to prove they can't beat it with a null
+window search and are searched again in full when one does, like young
+brothers wait. Like Engine an iteration that runs out of time is thrown away.
+
+ex. python parallel.py --workers 8 --depth 4"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from chessBoard import Chessboard, Move
+from engine import Engine, SearchResult, MATE, BENCH_POSITIONS
+from moveGen import generateLegalMoves, inCheck, moveFromUci
+from tablebase import Tablebase
+
+SERIAL_SHARE = 0.25 # of the move time the serial first iterations get at most
+
+worker = None # this process's Engine when it's a pool worker
+
+def startWorker(tablebasePath: str = None):
+    """Pool initializer, one Engine per worker kept for every root move it
+    gets, with its own copy of the tablebase if there is one"""
+    global worker
+    worker = Engine(tablebase=Tablebase(tablebasePath) if tablebasePath else None)
+    worker.keepHistory = True
+
+def rootScore(result: SearchResult) -> int:
+    """Score of a root move that left the other side with no moves, mate one
+    ply in like Engine scores it"""
+    return MATE - 1 if result.score else 0
+
+def searchRootMove(chessboard: Chessboard, move: Move, maxDepth: int, deadline: float,
+                   toBeat: int = None) -> tuple:
+    """Runs in a worker, returns (move, score, depth, nodes) with the score
+    from the root side's point of view. With toBeat the move is only searched
+    in full if it scores better than that. Moves still queued when the time
+    is up come back unsearched with depth 0"""
+    if time.time() >= deadline:
+        return move, 0, 0, 0
+    chessboard.makeMove(move)
+    engine = worker
+    depth = max(maxDepth - 1, 1)
+    nodes = 0
+    if toBeat is not None:
+        result = engine.search(chessboard, max(deadline - time.time(), 0.0), depth,
+                               -toBeat - 1, -toBeat)
+        nodes += result.nodes
+        if result.move is None:
+            return move, rootScore(result), maxDepth, nodes
+        if -result.score <= toBeat:
+            return move, -result.score, result.depth + 1, nodes
+
+    result = engine.search(chessboard, max(deadline - time.time(), 0.0), depth)
+    nodes += result.nodes
+    if result.move is None: # the root move mated or stalemated
+        return move, rootScore(result), maxDepth, nodes
+    return move, -result.score, result.depth + 1, nodes
+
+class ParallelEngine:
+    """Same search() as Engine but spread over workers processes, every
+    worker opens tablebase's file for itself"""
+
+    def __init__(self, workers: int, moveTime: float = 2.0, maxDepth: int = 64,
+                 tablebase: Tablebase = None) -> None:
+        self.workers = workers
+        self.moveTime = moveTime
+        self.maxDepth = maxDepth
+        self.engine = Engine(tablebase=tablebase) # the serial first iterations
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=startWorker,
+                                        initargs=(tablebase.path if tablebase else None,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def search(self, chessboard: Chessboard, moveTime: float = None, maxDepth: int = None) -> SearchResult:
+        moveTime = self.moveTime if moveTime is None else moveTime
+        maxDepth = self.maxDepth if maxDepth is None else maxDepth
+        start = time.perf_counter()
+        deadline = time.time() + moveTime
+
+        rootMoves = generateLegalMoves(chessboard, chessboard.turn)
+        if not rootMoves:
+            return SearchResult(None, -MATE if inCheck(chessboard, chessboard.turn) else 0,
+                                0, 0, 0.0, [])
+
+        # the shallow iterations are quicker on one core
+        serial = self.engine.search(chessboard, moveTime * SERIAL_SHARE, max(maxDepth - 1, 1))
+        best = (serial.move, serial.score, serial.depth)
+        nodes = serial.nodes
+        depthTimes = list(serial.depthTimes)
+        for depth in range(serial.depth + 1, maxDepth + 1):
+            if abs(best[1]) >= MATE - best[2] or time.time() >= deadline:
+                break
+            results = self.splitRoot(chessboard, rootMoves, best[0], depth, deadline)
+            nodes += sum(r[3] for r in results)
+            if min(r[2] for r in results) < depth: # ran out of time part way
+                break
+            move, score, _, _ = max(results, key=lambda r: r[1])
+            best = (move, score, depth)
+            depthTimes.append(time.perf_counter() - start)
+
+        move, score, depth = best
+        return SearchResult(move, score, depth, nodes, time.perf_counter() - start, depthTimes)
+
+    def splitRoot(self, chessboard: Chessboard, rootMoves: list, bestMove: Move, depth: int,
+                  deadline: float) -> list:
+        """(move, score, depth, nodes) for every root move searched to depth,
+        bestMove first"""
+        rootMoves = self.engine.orderMoves(chessboard, rootMoves, bestMove, 0)
+        first = self.pool.submit(searchRootMove, chessboard, rootMoves[0], depth, deadline)
+        results = [first.result()]
+        toBeat = results[0][1]
+        if toBeat >= MATE - 1: # nothing beats mate in one
+            return results
+        futures = [
+            self.pool.submit(searchRootMove, chessboard, move, depth, deadline, toBeat)
+            for move in rootMoves[1:]
+        ]
+        return results + [future.result() for future in as_completed(futures)]
+
+def benchTime(searcher, depth: int) -> float:
+    total = 0.0
+    for moves in BENCH_POSITIONS:
+        chessboard = Chessboard()
+        for uci in moves:
+            chessboard.makeMove(moveFromUci(chessboard, uci))
+        total += searcher.search(chessboard, maxDepth=depth).elapsed
+    return total
+
+def scaling(workers: int, depth: int, moveTime: float):
+    """Times the bench positions with a plain single process Engine and with
+    workers, and prints the speedup and how close it is to linear"""
+    serial = benchTime(Engine(moveTime), depth)
+    print(f'serial engine: {serial:.2f}s')
+    with ParallelEngine(workers, moveTime) as searcher:
+        parallel = benchTime(searcher, depth)
+    print(f'{workers} workers: {parallel:.2f}s')
+
+    speedup = serial / parallel
+    print(f'speedup {speedup:.2f}x, efficiency {speedup / workers:.0%}')
+
+def main():
+    parser = argparse.ArgumentParser(description='parallel root split search')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--movetime', type=float, default=60.0, help='seconds per position')
+    args = parser.parse_args()
+    scaling(args.workers, args.depth, args.movetime)
+
+if __name__ == "__main__":
+    main()
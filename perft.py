@@ -0,0 +1,99 @@
+"""Counts the leaf nodes of the legal move tree to a fixed depth, checked
+against the published perft numbers for the position.
+
+ex. python perft.py 4
+    python perft.py 3 --divide
+    python perft.py 3 --position kiwipete
+    python perft.py 2 --fen "8/8/8/8/8/8/8/K6k w - - 0 1"
+    python perft.py 3 --all
+    python perft.py 4 --bitboard"""
+import argparse
+import time
+from chessBoard import Chessboard
+from bitBoard import Bitboard
+from boardIO import START_FEN, boardFromFen
+from moveGen import generateLegalMoves, moveToUci
+
+POSITIONS = {
+    'start': START_FEN,
+    'kiwipete': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'position3': '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'position4': 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'position5': 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'position6': 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+}
+
+# nodes at depth 0, 1, 2, ...
+REFERENCE = {
+    'start': [1, 20, 400, 8902, 197281, 4865609, 119060324],
+    'kiwipete': [1, 48, 2039, 97862, 4085603],
+    'position3': [1, 14, 191, 2812, 43238, 674624],
+    'position4': [1, 6, 264, 9467, 422333],
+    'position5': [1, 44, 1486, 62379, 2103487],
+    'position6': [1, 46, 2079, 89890, 3894594],
+}
+
+def perft(chessboard: Chessboard, depth: int) -> int:
+    """Leaf nodes depth moves deep for the side to move"""
+    moves = generateLegalMoves(chessboard, chessboard.turn)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        chessboard.makeMove(move)
+        nodes += perft(chessboard, depth - 1)
+        chessboard.unmakeMove()
+    return nodes
+
+def divide(chessboard: Chessboard, depth: int) -> dict:
+    """Node count under each root move, for finding which move is wrong"""
+    counts = {}
+    for move in generateLegalMoves(chessboard, chessboard.turn):
+        chessboard.makeMove(move)
+        counts[moveToUci(chessboard, move)] = perft(chessboard, depth - 1)
+        chessboard.unmakeMove()
+    return counts
+
+def check(chessboard: Chessboard, depth: int, expected: list) -> bool:
+    """Prints every depth up to depth, False if any count was wrong"""
+    ok = True
+    for depth in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(chessboard, depth)
+        elapsed = time.perf_counter() - start
+        want = expected[depth] if depth < len(expected) else None
+        status = '' if want is None else ('ok' if nodes == want else f'WRONG, expected {want}')
+        ok = ok and (want is None or nodes == want)
+        print(f'depth {depth}: {nodes} nodes in {elapsed:.2f}s '
+              f'({nodes / max(elapsed, 1e-9):.0f} nodes/s) {status}')
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='perft node counts and speed')
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--divide', action='store_true', help='counts per root move')
+    parser.add_argument('--position', choices=list(POSITIONS), default='start')
+    parser.add_argument('--fen', help='any other position, nothing to check it against')
+    parser.add_argument('--all', action='store_true', help='every position in POSITIONS')
+    parser.add_argument('--bitboard', action='store_true', help='on a Bitboard instead of a Chessboard')
+    args = parser.parse_args()
+
+    if args.fen:
+        positions = [(args.fen, [])]
+    else:
+        names = list(POSITIONS) if args.all else [args.position]
+        positions = [(POSITIONS[name], REFERENCE[name]) for name in names]
+    failed = False
+    for fen, expected in positions:
+        chessboard = boardFromFen(fen, Bitboard if args.bitboard else Chessboard)
+        if len(positions) > 1:
+            print(fen)
+        if args.divide:
+            for move, nodes in divide(chessboard, args.depth).items():
+                print(f'{move}: {nodes}')
+        failed = not check(chessboard, args.depth, expected) or failed
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
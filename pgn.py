@@ -0,0 +1,175 @@
+"""Streams games out of PGN files and replays them on a Chessboard without any
+printing, for checking big archives against our move rules.
+
+Games are read one at a time so memory stays the same however big the file
+is. Bad moves are reported with the game number and ply they happened on.
+
+ex. python pgn.py games.pgn"""
+import argparse
+import re
+import time
+from typing import NamedTuple
+from chessBoard import Chessboard
+from boardIO import boardFromFen
+from notation import textToMove
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+HEADER = re.compile(r'\[(\w+)\s+"(.*)"\]')
+# comments, move numbers and annotations are dropped before moves are split out
+NOISE = re.compile(r'\{[^}]*\}|\$\d+|\d+\.(\.\.)?|[!?]+')
+
+class PgnGame(NamedTuple):
+    number: int    # 1 for the first game in the file
+    headers: dict
+    moves: list    # SAN strings
+    result: str
+
+class ReplayError(ValueError):
+    def __init__(self, game: int, ply: int, san: str, reason: str) -> None:
+        super().__init__(f'game {game} ply {ply} {san}: {reason}')
+        self.game = game
+        self.ply = ply
+        self.san = san
+        self.reason = reason
+
+def stripVariations(text: str) -> str:
+    """Drops anything inside ( ), which can be nested"""
+    if '(' not in text:
+        return text
+    kept, depth = [], 0
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            kept.append(char)
+    return ''.join(kept)
+
+def stripLineComment(line: str) -> str:
+    """Drops a ; comment, which runs to the end of its line, unless the ;
+    is inside a { } comment"""
+    depth = 0
+    for i, char in enumerate(line):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth = max(depth - 1, 0)
+        elif char == ';' and depth == 0:
+            return line[:i].rstrip()
+    return line
+
+def readGames(lines):
+    """Yields a PgnGame for every game in lines, which can be an open file so
+    only the game being read is ever in memory"""
+    if isinstance(lines, str):
+        with open(lines, encoding='utf-8', errors='replace') as file:
+            yield from readGames(file)
+        return
+
+    number = 0
+    headers, movetext = {}, []
+    inComment = False
+    for line in lines:
+        if line.startswith('%') and not inComment:
+            continue # an escape line, meant for other software not us
+        line = line.strip()
+        if inComment: # a { } comment carried over from the last line
+            if '}' not in line:
+                continue
+            line = line[line.index('}') + 1:]
+            inComment = False
+
+        line = stripLineComment(line)
+        if not movetext and line.startswith('['):
+            match = HEADER.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+            continue
+        if not line:
+            continue
+        if line.startswith('[') and movetext:
+            # headers of the next game, the last one never gave a result
+            number += 1
+            yield makeGame(number, headers, movetext)
+            headers, movetext = {}, []
+            match = HEADER.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+            continue
+
+        if line.count('{') > line.count('}'):
+            line = line[:line.rindex('{')]
+            inComment = True
+        movetext.append(line)
+        if line.split() and line.split()[-1] in RESULTS:
+            number += 1
+            yield makeGame(number, headers, movetext)
+            headers, movetext = {}, []
+
+    if movetext or headers:
+        number += 1
+        yield makeGame(number, headers, movetext)
+
+def makeGame(number: int, headers: dict, movetext: list) -> PgnGame:
+    text = stripVariations(NOISE.sub(' ', ' '.join(movetext)))
+    moves = text.split()
+    result = headers.get('Result', '*')
+    if moves and moves[-1] in RESULTS:
+        result = moves.pop()
+    return PgnGame(number, headers, moves, result)
+
+def sanToMove(chessboard: Chessboard, san: str):
+    """The legal move san means for the side to move, raises ValueError if
+    there isn't exactly one"""
+    return textToMove(chessboard, san)
+
+def replayGame(game: PgnGame, boardType=Chessboard) -> Chessboard:
+    """Plays every move of game on a fresh board and returns the board at the
+    end, raises ReplayError on the first move that can't be played"""
+    chessboard = boardType()
+    if 'FEN' in game.headers:
+        try:
+            chessboard = boardFromFen(game.headers['FEN'], boardType)
+        except ValueError as error:
+            raise ReplayError(game.number, 0, '', str(error)) from None
+    for ply, san in enumerate(game.moves, start=1):
+        try:
+            move = sanToMove(chessboard, san)
+        except ValueError as error:
+            raise ReplayError(game.number, ply, san, str(error)) from None
+        chessboard.makeMove(move)
+    return chessboard
+
+def replayFile(path: str, boardType=Chessboard):
+    """Yields (game, error) for every game in path, error is None when the
+    whole game replayed fine"""
+    for game in readGames(path):
+        try:
+            replayGame(game, boardType)
+            yield game, None
+        except ReplayError as error:
+            yield game, error
+
+def main():
+    parser = argparse.ArgumentParser(description='replay and check PGN files')
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    games = plies = bad = 0
+    start = time.perf_counter()
+    for path in args.files:
+        for game, error in replayFile(path):
+            games += 1
+            plies += len(game.moves) if error is None else error.ply
+            if error is not None:
+                bad += 1
+                print(f'{path}: {error}')
+    elapsed = time.perf_counter() - start
+    print(f'{games} games, {plies} plies, {bad} with errors in {elapsed:.2f}s '
+          f'({plies / max(elapsed, 1e-9):.0f} plies/s)')
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
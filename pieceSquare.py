@@ -0,0 +1,113 @@
+"""Piece values and piece-square tables, the part of the evaluation the board
+keeps up to date itself as pieces are put down and picked up.
+
+Tables are from white's side with row 0 as rank 8, the same as the board,
+black uses them mirrored top to bottom. PIECE_SQUARE has the value of each
+piece on each square with black's negative, so a board's pieceScore is just
+the sum over its pieces. Kings use their middlegame table there, evaluate
+swaps in KING_ENDGAME once the queens and most pieces are gone."""
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+TABLES = {
+    'P': [
+         0,  0,  0,  0,  0,  0,  0,  0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+         5,  5, 10, 25, 25, 10,  5,  5,
+         0,  0,  0, 20, 20,  0,  0,  0,
+         5, -5,-10,  0,  0,-10, -5,  5,
+         5, 10, 10,-20,-20, 10, 10,  5,
+         0,  0,  0,  0,  0,  0,  0,  0,
+    ],
+    'N': [
+        -50,-40,-30,-30,-30,-30,-40,-50,
+        -40,-20,  0,  0,  0,  0,-20,-40,
+        -30,  0, 10, 15, 15, 10,  0,-30,
+        -30,  5, 15, 20, 20, 15,  5,-30,
+        -30,  0, 15, 20, 20, 15,  0,-30,
+        -30,  5, 10, 15, 15, 10,  5,-30,
+        -40,-20,  0,  5,  5,  0,-20,-40,
+        -50,-40,-30,-30,-30,-30,-40,-50,
+    ],
+    'B': [
+        -20,-10,-10,-10,-10,-10,-10,-20,
+        -10,  0,  0,  0,  0,  0,  0,-10,
+        -10,  0,  5, 10, 10,  5,  0,-10,
+        -10,  5,  5, 10, 10,  5,  5,-10,
+        -10,  0, 10, 10, 10, 10,  0,-10,
+        -10, 10, 10, 10, 10, 10, 10,-10,
+        -10,  5,  0,  0,  0,  0,  5,-10,
+        -20,-10,-10,-10,-10,-10,-10,-20,
+    ],
+    'R': [
+         0,  0,  0,  0,  0,  0,  0,  0,
+         5, 10, 10, 10, 10, 10, 10,  5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+         0,  0,  0,  5,  5,  0,  0,  0,
+    ],
+    'Q': [
+        -20,-10,-10, -5, -5,-10,-10,-20,
+        -10,  0,  0,  0,  0,  0,  0,-10,
+        -10,  0,  5,  5,  5,  5,  0,-10,
+         -5,  0,  5,  5,  5,  5,  0, -5,
+          0,  0,  5,  5,  5,  5,  0, -5,
+        -10,  5,  5,  5,  5,  5,  0,-10,
+        -10,  0,  5,  0,  0,  0,  0,-10,
+        -20,-10,-10, -5, -5,-10,-10,-20,
+    ],
+    'K': [
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -20,-30,-30,-40,-40,-30,-30,-20,
+        -10,-20,-20,-20,-20,-20,-20,-10,
+         20, 20,  0,  0,  0,  0, 20, 20,
+         20, 30, 10,  0,  0, 10, 30, 20,
+    ],
+}
+KING_ENDGAME = [
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50,
+]
+
+def sideTable(table: list, color: str) -> list:
+    """table for color's pieces, black's mirrored and negative"""
+    if color == 'white':
+        return list(table)
+    return [-table[(7 - (square >> 3)) * 8 + (square & 7)] for square in range(64)]
+
+# (letter, color) -> white's score for that piece on each square row * 8 + col
+PIECE_SQUARE = {
+    (letter, color): [
+        value + (PIECE_VALUES[letter] if color == 'white' else -PIECE_VALUES[letter])
+        for value in sideTable(table, color)
+    ]
+    for letter, table in TABLES.items() for color in ('white', 'black')
+}
+KING_SWAP = { # add to a king's PIECE_SQUARE value to get its endgame one
+    color: [end - middle for end, middle in zip(sideTable(KING_ENDGAME, color), PIECE_SQUARE[('K', color)])]
+    for color in ('white', 'black')
+}
+
+def scoreBoard(chessboard) -> int:
+    """pieceScore of a Chessboard from scratch, the board keeps its own up to
+    date as it changes so this is for checking or starting one off"""
+    score = 0
+    for row in chessboard.board:
+        for piece in row:
+            if piece.color is not None:
+                r, c = piece.pos
+                score += PIECE_SQUARE[(piece.letter, piece.color)][r * 8 + c]
+    return score
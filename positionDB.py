@@ -0,0 +1,172 @@
+"""A file of position stats (games, results and the most played move) built
+from PGN files and read back through mmap.
+
+The file is a 16 byte header and then a power of two number of 64 byte
+slots, an open addressing hash table keyed on the board's Zobrist hash with
+linear probing. Nothing is read into memory when it's opened, lookups read
+the few slots they probe straight out of the mapping, so any number of
+processes can have the same file open and the OS shares the pages.
+
+ex. python positionDB.py build games.db games.pgn more.pgn
+    python positionDB.py query games.db --fen "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+"""
+import argparse
+import mmap
+import struct
+import time
+from typing import NamedTuple
+from chessBoard import Chessboard
+from boardIO import boardFromFen, packBoard, START_FEN
+from moveGen import moveFromUci, moveToUci
+from pgn import readGames, sanToMove
+
+MAGIC = b'BCPD'
+VERSION = 2 # hashes are Polyglot keys since 2
+HEADER = struct.Struct('<4sIQ')            # magic, version, slot count
+SLOT = struct.Struct('<Q32sIIII5s3x')      # hash, packed board, games, 1-0, 1/2, 0-1, best move uci
+MAX_LOAD = 0.5                             # slots are at least twice the positions
+
+class PositionStats(NamedTuple):
+    games: int
+    whiteWins: int
+    draws: int
+    blackWins: int
+    bestMove: str  # uci of the move played most from here, '' if none was
+
+class PositionDB:
+    """Read only view of a database file, ex.
+        with PositionDB('games.db') as db:
+            db.lookup(chessboard)"""
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a position database')
+        self.mask = self.slots - 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(1 for slot in range(self.slots) if self.readSlot(slot)[2])
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def readSlot(self, slot: int) -> tuple:
+        return SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+
+    def lookup(self, chessboard: Chessboard) -> PositionStats:
+        """Stats for chessboard's position, None if it never came up"""
+        key = chessboard.hash
+        packed = None
+        slot = key & self.mask
+        while True:
+            stored, board, games, whiteWins, draws, blackWins, best = self.readSlot(slot)
+            if not games: # empty slot, the position would have been here
+                return None
+            if stored == key:
+                # different positions can share a hash, the board settles it
+                packed = packed or packBoard(chessboard)
+                if board == packed:
+                    return PositionStats(games, whiteWins, draws, blackWins,
+                                         best.rstrip(b'\0').decode())
+            slot = (slot + 1) & self.mask
+
+    def bestMove(self, chessboard: Chessboard):
+        """The Move played most from chessboard's position, or None"""
+        stats = self.lookup(chessboard)
+        if stats is None or not stats.bestMove:
+            return None
+        return moveFromUci(chessboard, stats.bestMove)
+
+def gamePositions(paths: list, boardType=Chessboard):
+    """Yields (chessboard, uci played or None, result) for every position of
+    every game in paths, a game stops at its first bad move"""
+    for path in paths:
+        for game in readGames(path):
+            try:
+                chessboard = boardFromFen(game.headers.get('FEN', START_FEN), boardType)
+            except ValueError:
+                continue
+            for san in game.moves:
+                try:
+                    move = sanToMove(chessboard, san)
+                except ValueError:
+                    break
+                yield chessboard, moveToUci(chessboard, move), game.result
+                chessboard.makeMove(move)
+            else:
+                yield chessboard, None, game.result
+
+def buildDatabase(paths: list, out: str) -> int:
+    """Replays every game in paths and writes their positions to out, returns
+    how many positions were written"""
+    positions = {} # (hash, packed) -> [games, 1-0, 1/2, 0-1, {uci: times played}]
+    for chessboard, uci, result in gamePositions(paths):
+        key = (chessboard.hash, packBoard(chessboard))
+        stats = positions.get(key)
+        if stats is None:
+            stats = positions[key] = [0, 0, 0, 0, {}]
+        stats[0] += 1
+        if result in ('1-0', '1/2-1/2', '0-1'):
+            stats[1 + ('1-0', '1/2-1/2', '0-1').index(result)] += 1
+        if uci is not None:
+            stats[4][uci] = stats[4].get(uci, 0) + 1
+
+    slots = 16
+    while slots * MAX_LOAD < len(positions):
+        slots *= 2
+    mask = slots - 1
+    table = bytearray(HEADER.size + slots * SLOT.size)
+    HEADER.pack_into(table, 0, MAGIC, VERSION, slots)
+    for (key, packed), (games, whiteWins, draws, blackWins, moves) in positions.items():
+        slot = key & mask
+        while SLOT.unpack_from(table, HEADER.size + slot * SLOT.size)[2]:
+            slot = (slot + 1) & mask
+        best = max(moves, key=moves.get).encode() if moves else b''
+        SLOT.pack_into(table, HEADER.size + slot * SLOT.size, key, packed,
+                       games, whiteWins, draws, blackWins, best)
+
+    with open(out, 'wb') as file:
+        file.write(table)
+    return len(positions)
+
+def main():
+    parser = argparse.ArgumentParser(description='position database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a database from PGN files')
+    build.add_argument('database')
+    build.add_argument('files', nargs='+')
+    query = commands.add_parser('query', help='stats for one position')
+    query.add_argument('database')
+    query.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        count = buildDatabase(args.files, args.database)
+        print(f'{count} positions in {time.perf_counter() - start:.2f}s')
+        return 0
+
+    chessboard = boardFromFen(args.fen)
+    with PositionDB(args.database) as db:
+        start = time.perf_counter()
+        stats = db.lookup(chessboard)
+        elapsed = time.perf_counter() - start
+    if stats is None:
+        print(f'not in the database ({elapsed * 1e6:.0f}us)')
+        return 1
+    print(f'{stats.games} games, +{stats.whiteWins} ={stats.draws} -{stats.blackWins}, '
+          f'most played {stats.bestMove or "-"} ({elapsed * 1e6:.0f}us)')
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,303 @@
+"""An asyncio TCP server where every connection is its own game, so one
+process can keep thousands of games going at once.
+
+The protocol is one line per command and one line back, easy to try with
+nc localhost 8765:
+    move e4          ok e2e4 (or ok e7f7 check, ok h5f7 checkmate 1-0,
+                     ok g1f3 threefold repetition 1/2-1/2 ...)
+    pass             ok black to move
+    reset            game <fen>
+    resign           result 0-1 resign
+    board            fen <fen>
+    clock            clock <white seconds> <black seconds>
+    quit             bye
+Anything that can't be done gets error <reason>. A game on a clock ends with
+result ... time when the side to move runs out, and a connection that says
+nothing for the idle timeout is sent bye idle and closed. With a journal
+directory every game is also recorded to its own file there as it's played,
+see gameJournal.py, so a crash loses nothing and Chessgame.resume picks the
+game back up.
+
+ex. python server.py serve --port 8765 --clock 300 --increment 2
+    python server.py bench --clients 2000 --moves 40"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from chessBoard import Chessboard
+from chessGame import Chessgame
+from gameJournal import GameJournal
+from moveGen import moveToUci
+
+IDLE_TIMEOUT = 600.0 # seconds a connection can say nothing for
+BACKLOG = 4096       # connections waiting to be accepted, bench clients all connect at once
+# a short game the bench clients play over and over
+BENCH_GAME = ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Ba4', 'Nf6', 'O-O', 'Be7',
+              'Re1', 'b5', 'Bb3', 'd6', 'c3', 'O-O', 'h3', 'Nb8', 'd4', 'Nbd7']
+
+class Clock:
+    """Seconds left for each side, only the side to move's time runs"""
+
+    def __init__(self, seconds: float, increment: float = 0.0) -> None:
+        self.left = {'white': seconds, 'black': seconds}
+        self.increment = increment
+        self.started = time.monotonic() # when the side to move's time started
+
+    def remaining(self, color: str, turn: str) -> float:
+        if color != turn:
+            return self.left[color]
+        return self.left[color] - (time.monotonic() - self.started)
+
+    def press(self, color: str):
+        """color has moved, their time stops and gets the increment"""
+        now = time.monotonic()
+        self.left[color] += self.increment - (now - self.started)
+        self.started = now
+
+class GameSession:
+    """One connection's game, handle() takes a line and gives back the reply"""
+
+    def __init__(self, seconds: float = 0.0, increment: float = 0.0, journalDir: str = None) -> None:
+        self.seconds = seconds # 0 for no clock
+        self.increment = increment
+        self.journalDir = journalDir # None to not record games
+        self.game = None
+        self.reset()
+        self.commands = {
+            'move': self.onMove, 'pass': self.onPass, 'reset': self.onReset,
+            'resign': self.onResign, 'board': self.onBoard, 'clock': self.onClock,
+        }
+
+    def reset(self):
+        self.close()
+        chessboard = Chessboard()
+        journal = None
+        if self.journalDir is not None:
+            journal = GameJournal(os.path.join(self.journalDir, f'{uuid.uuid4().hex}.journal'), chessboard)
+        self.game = Chessgame(chessboard, journal=journal)
+        self.clock = Clock(self.seconds, self.increment) if self.seconds else None
+        self.result = None # '1-0 checkmate' and so on once the game is over
+
+    def close(self):
+        if self.game is not None and self.game.journal is not None:
+            self.game.journal.close()
+
+    @property
+    def turn(self) -> str:
+        return self.game.turn
+
+    def timeLeft(self):
+        """Seconds before the side to move runs out, None with no clock or
+        when the game is already over"""
+        if self.clock is None or self.result is not None:
+            return None
+        return self.clock.remaining(self.turn, self.turn)
+
+    def flagged(self) -> bool:
+        """Ends the game if the side to move has run out of time"""
+        left = self.timeLeft()
+        if left is None or left > 0:
+            return False
+        self.result = f'{"0-1" if self.turn == "white" else "1-0"} time'
+        return True
+
+    def handle(self, line: str) -> str:
+        command, _, argument = line.strip().partition(' ')
+        if self.flagged():
+            return f'result {self.result}'
+        handler = self.commands.get(command)
+        if handler is None:
+            return f'error unknown command {command}'
+        return handler(argument.strip())
+
+    def onMove(self, argument: str) -> str:
+        if self.result is not None:
+            return f'error game over {self.result}'
+        color = self.turn
+        try:
+            move = self.game.playMove(argument)
+        except ValueError as error:
+            return f'error {error}'
+        uci = moveToUci(self.game.boardObj, move)
+        if self.clock is not None:
+            self.clock.press(color)
+
+        check, stuck = self.game.inCheck()
+        if check and stuck:
+            self.result = f'{"1-0" if color == "white" else "0-1"} checkmate'
+            return f'ok {uci} checkmate {self.result.split()[0]}'
+        if stuck:
+            self.result = '1/2-1/2 stalemate'
+            return f'ok {uci} stalemate 1/2-1/2'
+        draw = self.game.drawReason()
+        if draw:
+            self.result = f'1/2-1/2 {draw}'
+            return f'ok {uci} {draw} 1/2-1/2'
+        return f'ok {uci} check' if check else f'ok {uci}'
+
+    def onPass(self, argument: str) -> str:
+        if self.result is not None:
+            return f'error game over {self.result}'
+        if self.clock is not None:
+            self.clock.press(self.turn)
+        self.game.passTurn()
+        return f'ok {self.turn} to move'
+
+    def onReset(self, argument: str) -> str:
+        self.reset()
+        return f'game {self.game.toFen()}'
+
+    def onResign(self, argument: str) -> str:
+        if self.result is not None:
+            return f'error game over {self.result}'
+        self.result = f'{"0-1" if self.turn == "white" else "1-0"} resign'
+        return f'result {self.result}'
+
+    def onBoard(self, argument: str) -> str:
+        return f'fen {self.game.toFen()}'
+
+    def onClock(self, argument: str) -> str:
+        if self.clock is None:
+            return 'error no clock'
+        white = self.clock.remaining('white', self.turn)
+        black = self.clock.remaining('black', self.turn)
+        return f'clock {max(white, 0.0):.1f} {max(black, 0.0):.1f}'
+
+class GameServer:
+    """ex.
+        server = GameServer(clock=300, increment=2)
+        await server.start('localhost', 8765)"""
+
+    def __init__(self, clock: float = 0.0, increment: float = 0.0,
+                 idleTimeout: float = IDLE_TIMEOUT, journalDir: str = None) -> None:
+        self.clock = clock
+        self.increment = increment
+        self.idleTimeout = idleTimeout
+        self.journalDir = journalDir
+        self.sessions = set() # games with a connection open
+        self.server = None
+
+    async def start(self, host: str = 'localhost', port: int = 8765) -> int:
+        """Starts listening and returns the port, handy when port is 0"""
+        self.server = await asyncio.start_server(self.handleClient, host, port, backlog=BACKLOG)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = GameSession(self.clock, self.increment, self.journalDir)
+        self.sessions.add(session)
+        try:
+            writer.write(f'game {session.game.toFen()}\n'.encode())
+            while True:
+                # wake up when the side to move's flag falls even if nobody types
+                timeout = self.idleTimeout
+                left = session.timeLeft()
+                if left is not None:
+                    timeout = min(timeout, max(left, 0.0))
+                try:
+                    line = await asyncio.wait_for(reader.readline(), timeout)
+                except asyncio.TimeoutError:
+                    if session.flagged():
+                        writer.write(f'result {session.result}\n'.encode())
+                        continue
+                    writer.write(b'bye idle\n')
+                    break
+                if not line:
+                    break
+                text = line.decode(errors='replace').strip()
+                if text == 'quit':
+                    writer.write(b'bye\n')
+                    break
+                if text:
+                    writer.write(session.handle(text).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            session.close()
+            writer.close()
+
+async def benchClient(port: int, moves: int, latencies: list):
+    """Connects and plays BENCH_GAME over and over until it has sent moves
+    moves, timing every reply"""
+    reader, writer = await asyncio.open_connection('localhost', port)
+    await reader.readline() # game <fen>
+    for i in range(moves):
+        ply = i % (len(BENCH_GAME) + 1)
+        command = f'move {BENCH_GAME[ply]}' if ply < len(BENCH_GAME) else 'reset'
+        start = time.perf_counter()
+        writer.write(command.encode() + b'\n')
+        reply = await reader.readline()
+        latencies.append(time.perf_counter() - start)
+        if reply.startswith(b'error'):
+            raise RuntimeError(f'{command}: {reply.decode().strip()}')
+    writer.write(b'quit\n')
+    await reader.readline()
+    writer.close()
+
+async def bench(clients: int, moves: int, journalDir: str = None) -> dict:
+    """Runs a server and clients clients in this process, every client
+    sending moves commands as fast as it gets replies"""
+    server = GameServer(journalDir=journalDir)
+    port = await server.start('localhost', 0)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(benchClient(port, moves, latencies) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    await server.stop()
+    latencies.sort()
+    return {
+        'clients': clients,
+        'moves': len(latencies),
+        'seconds': elapsed,
+        'movesPerSecond': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[int(len(latencies) * 0.99)],
+    }
+
+async def serve(args):
+    if args.journal:
+        os.makedirs(args.journal, exist_ok=True)
+    server = GameServer(args.clock, args.increment, args.idle, args.journal)
+    port = await server.start(args.host, args.port)
+    print(f'listening on {args.host}:{port}')
+    async with server.server:
+        await server.server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='chess game server')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('serve', help='host games until stopped')
+    run.add_argument('--host', default='localhost')
+    run.add_argument('--port', type=int, default=8765)
+    run.add_argument('--clock', type=float, default=0.0, help='seconds per side, 0 for no clock')
+    run.add_argument('--increment', type=float, default=0.0, help='seconds added after each move')
+    run.add_argument('--idle', type=float, default=IDLE_TIMEOUT, help='seconds before a quiet connection is closed')
+    run.add_argument('--journal', help='directory to record every game to')
+    timing = commands.add_parser('bench', help='moves per second with lots of clients at once')
+    timing.add_argument('--clients', type=int, default=1000)
+    timing.add_argument('--moves', type=int, default=20, help='commands each client sends')
+    timing.add_argument('--journal', help='directory to record the games to')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.journal:
+        os.makedirs(args.journal, exist_ok=True)
+    stats = asyncio.run(bench(args.clients, args.moves, args.journal))
+    print(f'{stats["clients"]} clients, {stats["moves"]} moves in {stats["seconds"]:.2f}s '
+          f'({stats["movesPerSecond"]:.0f} moves/s), latency p50 {stats["p50"] * 1000:.1f}ms '
+          f'p99 {stats["p99"] * 1000:.1f}ms')
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,402 @@
+"""Endgame tablebases for king and one or two pieces against a lone king (KQK,
+KRK, KPK and KBNK), worked out by retrograde analysis and probed with a
+Chessboard.
+
+Generating starts from every mate and works backwards: a position where the
+strong side can move into a lost position is won, and a position where every
+move of the lone king goes into a won one is lost. Anything never reached is
+a draw. Every position gets a byte, 0 for a draw and otherwise the plies to
+mate plus 1, so a table is read by working out a position's index.
+
+Positions are stored the way round that puts the strong side as white, and
+pawnless tables only keep positions with the white king in the a1-d1-d4
+triangle, the other seven eighths are mirror images. KPK only mirrors files.
+Squares are absolute, row * 8 + col with row 0 as rank 8.
+
+ex. python tablebase.py build tablebases.bin
+    python tablebase.py probe tablebases.bin --fen "8/8/8/3k4/8/8/8/K1Q5 w - - 0 1"
+"""
+import argparse
+import mmap
+import struct
+import time
+from typing import NamedTuple
+from chessBoard import Chessboard, King
+from boardIO import boardFromFen
+from attackTables import (KNIGHT_TARGETS, KING_TARGETS, RAY_TARGETS, PAWN_CAPTURE_TARGETS,
+                          STRAIGHT, DIAGONAL)
+
+MAGIC = b'BCTB'
+HEADER = struct.Struct('<4sI')     # magic, table count
+DIRECTORY = struct.Struct('<8sQQ') # name, offset, size
+DRAW, ILLEGAL = 0, 255
+CANT_LOSE = 255                    # move count of a lone king with a way out
+
+# table name -> strong side's pieces, KPK needs KQK and KRK for its promotions
+TABLES = {'KQK': 'Q', 'KRK': 'R', 'KPK': 'P', 'KBNK': 'BN'}
+BUILD_ORDER = ('KQK', 'KRK', 'KPK', 'KBNK')
+
+KING_NEAR = [frozenset(squares) for squares in KING_TARGETS]
+KNIGHT_NEAR = [frozenset(squares) for squares in KNIGHT_TARGETS]
+PAWN_NEAR = [frozenset(squares) for squares in PAWN_CAPTURE_TARGETS['white']]
+SLIDES = {
+    'R': STRAIGHT, 'B': DIAGONAL, 'Q': STRAIGHT + DIAGONAL,
+}
+
+def buildLines() -> dict:
+    """(from, to) -> (letters that slide that way, squares in between)"""
+    lines = {}
+    for sq in range(64):
+        for direction, ray in RAY_TARGETS[sq].items():
+            letters = 'RQ' if direction in STRAIGHT else 'BQ'
+            for i, target in enumerate(ray):
+                lines[(sq, target)] = (letters, ray[:i])
+    return lines
+
+LINES = buildLines()
+
+# the 8 ways of turning the board over, as square -> square maps
+def transform(mirrorFile: bool, mirrorRank: bool, swap: bool) -> list:
+    squares = []
+    for sq in range(64):
+        file, rank = sq & 7, 7 - (sq >> 3)
+        if swap:
+            file, rank = rank, file
+        file = 7 - file if mirrorFile else file
+        rank = 7 - rank if mirrorRank else rank
+        squares.append((7 - rank) * 8 + file)
+    return squares
+
+TRANSFORMS = [transform(f, r, s) for s in (False, True) for r in (False, True) for f in (False, True)]
+TRIANGLE = [(7 - rank) * 8 + file for file in range(4) for rank in range(file + 1)]
+SLOT = {sq: i for i, sq in enumerate(TRIANGLE)}
+# the transforms that bring a white king on sq into the triangle, two when
+# it lands on the diagonal
+KING_TRANSFORMS = [[t for t in TRANSFORMS if t[sq] in SLOT] for sq in range(64)]
+
+def tableSize(name: str) -> int:
+    if 'P' in TABLES[name]:
+        return 2 * 24 * 64 * 64
+    return 2 * len(TRIANGLE) * 64 ** (1 + len(TABLES[name]))
+
+def tableIndex(name: str, stm: int, wk: int, bk: int, pieces: tuple) -> int:
+    """Index of a position with the strong side as white, stm 0 for white to
+    move. Symmetric positions all get the same index"""
+    if 'P' in TABLES[name]:
+        pawn = pieces[0]
+        if pawn & 7 > 3:
+            pawn, wk, bk = pawn ^ 7, wk ^ 7, bk ^ 7
+        return ((stm * 24 + ((pawn >> 3) - 1) * 4 + (pawn & 7)) * 64 + wk) * 64 + bk
+
+    best = None
+    for t in KING_TRANSFORMS[wk]:
+        index = (stm * len(TRIANGLE) + SLOT[t[wk]]) * 64 + t[bk]
+        for sq in pieces:
+            index = index * 64 + t[sq]
+        if best is None or index < best:
+            best = index
+    return best
+
+def attacked(sq: int, wk: int, letters: str, pieces: tuple, occupied: set) -> bool:
+    """Does white attack sq, pieces standing on sq don't count"""
+    if sq in KING_NEAR[wk]:
+        return True
+    for letter, at in zip(letters, pieces):
+        if at == sq:
+            continue
+        if letter == 'N':
+            if sq in KNIGHT_NEAR[at]:
+                return True
+        elif letter == 'P':
+            if sq in PAWN_NEAR[at]:
+                return True
+        else:
+            line = LINES.get((at, sq))
+            if line and letter in line[0] and not any(b in occupied for b in line[1]):
+                return True
+    return False
+
+class Generator:
+    """Works out one table, tables holds the finished ones it promotes into"""
+
+    def __init__(self, name: str, tables: dict) -> None:
+        self.name = name
+        self.letters = TABLES[name]
+        self.tables = tables
+        self.values = bytearray(tableSize(name))
+        self.moves = bytearray(tableSize(name)) # lone king moves not yet shown to lose
+        self.buckets = [[]]                     # plies -> positions decided at that many
+
+    def index(self, stm: int, wk: int, bk: int, pieces: tuple) -> int:
+        return tableIndex(self.name, stm, wk, bk, pieces)
+
+    def positions(self):
+        """Every (wk, bk, pieces) with no two on one square and pawns off the
+        back ranks, only the layouts the index keeps"""
+        pieceSquares = range(64)
+        if 'P' in self.letters:
+            kings = range(64)
+            pieceSquares = [row * 8 + col for row in range(1, 7) for col in range(4)]
+        else:
+            kings = TRIANGLE
+        layouts = [()]
+        for _ in self.letters:
+            layouts = [layout + (sq,) for layout in layouts for sq in pieceSquares]
+        for wk in kings:
+            for bk in range(64):
+                if bk == wk or bk in KING_NEAR[wk]:
+                    continue
+                for pieces in layouts:
+                    if wk in pieces or bk in pieces or len(set(pieces)) < len(pieces):
+                        continue
+                    yield wk, bk, pieces
+
+    def push(self, plies: int, position: tuple):
+        while len(self.buckets) <= plies:
+            self.buckets.append([])
+        self.buckets[plies].append(position)
+
+    def setUp(self):
+        """Marks every position illegal, then finds the legal ones, the mates
+        and the promotions into other tables"""
+        self.values[:] = bytes([ILLEGAL]) * len(self.values)
+        letters = self.letters
+        for wk, bk, pieces in self.positions():
+            occupied = {wk, bk, *pieces}
+            if (wk, bk, pieces) != self.canonical(wk, bk, pieces):
+                continue # a mirror image of one that is kept
+            check = attacked(bk, wk, letters, pieces, occupied)
+            black = self.index(1, wk, bk, pieces)
+            self.values[black] = DRAW
+            self.countMoves(black, wk, bk, pieces, occupied, check)
+            white = self.index(0, wk, bk, pieces)
+            if not check:
+                self.values[white] = DRAW
+                if 'P' in letters and pieces[0] < 16:
+                    self.promote(white, wk, bk, pieces)
+
+    def canonical(self, wk: int, bk: int, pieces: tuple) -> tuple:
+        """The layout of a position the index keeps"""
+        if 'P' in self.letters:
+            return wk, bk, pieces
+        best, layout = None, None
+        for t in KING_TRANSFORMS[wk]:
+            moved = (t[wk], t[bk], tuple(t[sq] for sq in pieces))
+            key = (moved[1],) + moved[2]
+            if best is None or key < best:
+                best, layout = key, moved
+        return layout
+
+    def countMoves(self, black: int, wk: int, bk: int, pieces: tuple, occupied: set, check: bool):
+        letters = self.letters
+        occupied = occupied - {bk} # the king can't hide behind itself
+        successors = set()
+        for to in KING_TARGETS[bk]:
+            if to in KING_NEAR[wk]:
+                continue
+            if to in pieces:
+                # taking a piece leaves a draw unless it was guarded
+                i = pieces.index(to)
+                if not attacked(to, wk, letters[:i] + letters[i + 1:],
+                                pieces[:i] + pieces[i + 1:], occupied):
+                    self.moves[black] = CANT_LOSE
+                    return
+                continue
+            if not attacked(to, wk, letters, pieces, occupied):
+                successors.add(self.index(0, wk, to, pieces))
+
+        if successors:
+            self.moves[black] = len(successors)
+        elif check:
+            self.values[black] = 1 # mated, 0 plies
+            self.push(0, (black, wk, bk, pieces))
+        else:
+            self.moves[black] = CANT_LOSE # stalemate
+
+    def promote(self, white: int, wk: int, bk: int, pieces: tuple):
+        """Queening or making a rook is a move into KQK or KRK"""
+        to = pieces[0] - 8
+        if to in (wk, bk):
+            return
+        for name in ('KQK', 'KRK'):
+            value = self.tables[name][tableIndex(name, 1, wk, bk, (to,))]
+            # one ply more than the lost position promoting leaves
+            if value not in (DRAW, ILLEGAL) and self.improve(white, value + 1):
+                self.push(value, (white, wk, bk, pieces))
+
+    def improve(self, index: int, value: int) -> bool:
+        current = self.values[index]
+        if current == ILLEGAL or (current != DRAW and current <= value):
+            return False
+        self.values[index] = value
+        return True
+
+    def whiteUnmoves(self, wk: int, bk: int, pieces: tuple):
+        """Positions with white to move that white moved from to get here"""
+        occupied = {wk, bk, *pieces}
+        for sq in KING_TARGETS[wk]:
+            if sq not in occupied and sq not in KING_NEAR[bk]:
+                yield sq, bk, pieces
+        for i, letter in enumerate(self.letters):
+            at = pieces[i]
+            if letter == 'N':
+                froms = [sq for sq in KNIGHT_TARGETS[at] if sq not in occupied]
+            elif letter == 'P':
+                froms = []
+                if at < 48 and at + 8 not in occupied:
+                    froms.append(at + 8)
+                    if at >> 3 == 4 and at + 16 not in occupied:
+                        froms.append(at + 16)
+            else:
+                froms = []
+                for direction in SLIDES[letter]:
+                    for sq in RAY_TARGETS[at][direction]:
+                        if sq in occupied:
+                            break
+                        froms.append(sq)
+            for sq in froms:
+                yield wk, bk, pieces[:i] + (sq,) + pieces[i + 1:]
+
+    def generate(self) -> bytearray:
+        self.setUp()
+        letters = self.letters
+        plies = 0
+        while plies < len(self.buckets):
+            for index, wk, bk, pieces in self.buckets[plies]:
+                if self.values[index] != plies + 1:
+                    continue # found a quicker mate since
+                if plies % 2 == 0:
+                    # lone king lost, whatever white came from wins
+                    for position in self.whiteUnmoves(wk, bk, pieces):
+                        pwk, pbk, ppieces = position
+                        if attacked(pbk, pwk, letters, ppieces, {pwk, pbk, *ppieces}):
+                            continue
+                        white = self.index(0, *position)
+                        if self.improve(white, plies + 2):
+                            self.push(plies + 1, (white,) + position)
+                else:
+                    # won for white, the lone king squares it came from lose one more way
+                    froms = {}
+                    for sq in KING_TARGETS[bk]:
+                        if sq not in pieces and sq != wk and sq not in KING_NEAR[wk]:
+                            froms[self.index(1, wk, sq, pieces)] = sq
+                    for black, sq in froms.items():
+                        if self.values[black] != DRAW or self.moves[black] == CANT_LOSE:
+                            continue
+                        self.moves[black] -= 1
+                        if not self.moves[black]:
+                            self.values[black] = plies + 2
+                            self.push(plies + 1, (black, wk, sq, pieces))
+            self.buckets[plies] = None
+            plies += 1
+        return self.values
+
+def buildTables(path: str, names=BUILD_ORDER) -> dict:
+    """Generates names (and the tables they need) and writes them to path,
+    returns name -> seconds taken"""
+    tables, timings = {}, {}
+    wanted = set(names) | ({'KQK', 'KRK'} if 'KPK' in names else set())
+    for name in BUILD_ORDER:
+        if name in wanted:
+            start = time.perf_counter()
+            tables[name] = Generator(name, tables).generate()
+            timings[name] = time.perf_counter() - start
+
+    offset = HEADER.size + DIRECTORY.size * len(tables)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(tables)))
+        for name, values in tables.items():
+            file.write(DIRECTORY.pack(name.encode(), offset, len(values)))
+            offset += len(values)
+        for values in tables.values():
+            file.write(values)
+    return timings
+
+class TablebaseResult(NamedTuple):
+    result: str # 'win', 'draw' or 'loss' for the side to move
+    plies: int  # to mate, 0 for a draw
+
+class Tablebase:
+    """ex.
+        with Tablebase('tablebases.bin') as tablebase:
+            tablebase.probe(chessboard)"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a tablebase file')
+        self.offsets = {}
+        for i in range(count):
+            name, offset, size = DIRECTORY.unpack_from(self.data, HEADER.size + i * DIRECTORY.size)
+            self.offsets[name.rstrip(b'\0').decode()] = offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def probe(self, chessboard: Chessboard) -> TablebaseResult:
+        """The result for the side to move, None for material there's no table for"""
+        if sum(len(located) for located in chessboard.pieceIndex.values()) > 4:
+            return None
+        strong, pieces = None, []
+        for (kind, color), located in chessboard.pieceIndex.items():
+            if located and kind is not King:
+                if strong not in (None, color):
+                    return None # both sides have something
+                strong = color
+                pieces += [(kind.letter, row * 8 + col) for row, col in located]
+        pieces.sort(key=lambda piece: 'QRBNP'.index(piece[0]))
+        name = 'K' + ''.join(letter for letter, sq in pieces) + 'K'
+        if name not in self.offsets:
+            return None
+
+        flip = 56 if strong == 'black' else 0 # rank mirror so the strong side is white
+        row, col = chessboard.getKing(strong).pos
+        wk = (row * 8 + col) ^ flip
+        weak = 'white' if strong == 'black' else 'black'
+        row, col = chessboard.getKing(weak).pos
+        bk = (row * 8 + col) ^ flip
+        stm = 0 if chessboard.turn == strong else 1
+        index = tableIndex(name, stm, wk, bk, tuple(sq ^ flip for letter, sq in pieces))
+        value = self.data[self.offsets[name] + index]
+        if value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return TablebaseResult('draw', 0)
+        return TablebaseResult('win' if stm == 0 else 'loss', value - 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='endgame tablebases')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='generate tables')
+    build.add_argument('file')
+    build.add_argument('--tables', nargs='+', choices=BUILD_ORDER, default=list(BUILD_ORDER))
+    probe = commands.add_parser('probe', help='look a position up')
+    probe.add_argument('file')
+    probe.add_argument('--fen', required=True)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for name, seconds in buildTables(args.file, args.tables).items():
+            print(f'{name}: {tableSize(name)} positions in {seconds:.1f}s')
+        return 0
+    with Tablebase(args.file) as tablebase:
+        result = tablebase.probe(boardFromFen(args.fen))
+    if result is None:
+        print('no table for this position')
+        return 1
+    print(result.result if result.result == 'draw' else f'{result.result}, mate in {result.plies} plies')
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
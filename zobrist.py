@@ -0,0 +1,52 @@
+"""64 bit Zobrist keys for identifying positions.
+
+The keys are Polyglot's own Random64 numbers in Polyglot's layout (12 * 64
+piece squares, 4 castling rights, 8 en passant files, white to move), so a
+board's hash is its Polyglot book key except that the en passant file is
+hashed in whenever there is an en passant square, see book.polyglotKey.
+Squares here are absolute, row 0 is rank 8 whichever way the board is
+printed."""
+from polyglotRandom import RANDOM64
+
+RANDOM = RANDOM64
+
+# Polyglot order, black before white for each kind
+PIECE_ORDER = ('P', 'N', 'B', 'R', 'Q', 'K')
+
+def pieceKeys(keys: list) -> dict:
+    """(letter, color) -> key for each absolute square row * 8 + col"""
+    table = {}
+    for kind, letter in enumerate(PIECE_ORDER):
+        for color, isWhite in (('black', 0), ('white', 1)):
+            offset = 64 * (2 * kind + isWhite)
+            table[(letter, color)] = [
+                keys[offset + 8 * (7 - row) + col] for row in range(8) for col in range(8)
+            ]
+    return table
+
+PIECE_KEYS = pieceKeys(RANDOM)
+CASTLING_KEYS = {'K': RANDOM[768], 'Q': RANDOM[769], 'k': RANDOM[770], 'q': RANDOM[771]}
+EN_PASSANT_KEYS = RANDOM[772:780] # by file
+WHITE_TO_MOVE = RANDOM[780]
+
+def castlingKey(rights: str) -> int:
+    key = 0
+    for right in rights:
+        key ^= CASTLING_KEYS[right]
+    return key
+
+def turnKey(color: str) -> int:
+    return WHITE_TO_MOVE if color == 'white' else 0
+
+def hashBoard(chessboard) -> int:
+    """Full hash of a Chessboard from scratch, the board keeps its own hash up
+    to date as it changes so this is for checking or starting one off"""
+    key = 0
+    for row in chessboard.board:
+        for piece in row:
+            if piece.color is not None:
+                row, col = piece.pos
+                key ^= PIECE_KEYS[(piece.letter, piece.color)][row * 8 + col]
+    if chessboard.enPassant is not None:
+        key ^= EN_PASSANT_KEYS[chessboard.enPassant[1]]
+    return key ^ castlingKey(chessboard.castling) ^ turnKey(chessboard.turn)